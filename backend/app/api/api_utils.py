@@ -1,12 +1,46 @@
 import os
+import json
+import time
+import asyncio
 import uuid
+import base64
 import logging
-from fastapi import UploadFile
-from app.config import UPLOAD_DIR, CLIPS_DIR
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from typing import Tuple, List, Dict, Any, Optional
+from fastapi import UploadFile, Request
+from fastapi.responses import Response, StreamingResponse
+from app.config import UPLOAD_DIR, CLIPS_DIR, PROGRESS_STREAM_INTERVAL_SECONDS, CLEANUP_JOB_TTL_SECONDS
+from sqlmodel import Session
+from app.db.engine import engine, DBClient
+from app.db.models import Video, IndexingProgress, CleanupJob
+from app.services.manifest import delete_manifest
+from app.services.packaging import delete_package
+from app.services.thumbnails import delete_thumbnails
+from app.services.proxy import delete_proxy
 
 logger = logging.getLogger(__name__)
 
 VIDEO_SUFFIXES = {".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm"}
+VIDEO_MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".avi": "video/x-msvideo",
+    ".mkv": "video/x-matroska",
+    ".mov": "video/quicktime",
+    ".wmv": "video/x-ms-wmv",
+    ".flv": "video/x-flv",
+    ".webm": "video/webm",
+}
+STREAM_CHUNK_SIZE = 1024 * 1024
+VIDEO_PATH_CACHE_TTL_SECONDS = 300
+VIDEO_PATH_CACHE_MAX = 1024
+SSE_KEEPALIVE_SECONDS = 15
+
+# video_id -> (video_path, expires_at)
+_video_path_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_video_path_cache_lock = threading.Lock()
 
 
 async def upload_video_file(file: UploadFile):
@@ -34,6 +68,117 @@ def search_video_file(video_id: str):
     return None
 
 
+def video_media_type(path: str) -> str:
+    return VIDEO_MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def resolve_video_path(video_id: str, db) -> Optional[str]:
+    """
+    Resolve the stored Video.video_path, through a small TTL cache. Invalidation only
+    reaches this process, so a cached path is re-checked on disk before it is trusted:
+    a video deleted through another worker falls through to the database.
+    """
+    now = time.monotonic()
+    with _video_path_cache_lock:
+        cached = _video_path_cache.get(video_id)
+        if cached and cached[1] > now:
+            _video_path_cache.move_to_end(video_id)
+    if cached and cached[1] > now:
+        if os.path.exists(cached[0]):
+            return cached[0]
+        invalidate_video_path(video_id)
+
+    video = db.get_video(video_id)
+    if not video or not os.path.isfile(video.video_path):
+        return None
+
+    with _video_path_cache_lock:
+        _video_path_cache[video_id] = (video.video_path, now + VIDEO_PATH_CACHE_TTL_SECONDS)
+        while len(_video_path_cache) > VIDEO_PATH_CACHE_MAX:
+            _video_path_cache.popitem(last=False)
+    return video.video_path
+
+
+def invalidate_video_path(video_id: str):
+    with _video_path_cache_lock:
+        _video_path_cache.pop(video_id, None)
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=' range into inclusive (start, end); None if unsatisfiable."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    # Multi-range requests are answered with their first range
+    first = spec.split(",")[0].strip()
+    start_str, _, end_str = first.partition("-")
+    try:
+        if not start_str:
+            length = int(end_str)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request: Request, path: str, media_type: str,
+                            extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serve a file with byte-range support and ETag / If-None-Match / If-Range handling.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Last-Modified": last_modified,
+               **(extra_headers or {})}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (etag, last_modified)):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}",
+                        "Content-Length": str(end - start + 1)})
+        return StreamingResponse(_iter_file(path, start, end), status_code=206,
+                                    media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size - 1), media_type=media_type, headers=headers)
+
+
+def delete_video_artifacts(video_id: str):
+    """Remove derived data kept per video: manifests, HLS segments, thumbnails, proxies, cached path."""
+    delete_manifest(video_id)
+    delete_package(video_id)
+    delete_thumbnails(video_id)
+    delete_proxy(video_id)
+    invalidate_video_path(video_id)
+
+
 def delete_video_file(video_id: str):
     deleted_files = []
     for video_file in UPLOAD_DIR.glob(f"{video_id}.*"):
@@ -50,3 +195,124 @@ def delete_clips(video_id: str):
             clip_file.unlink()
             deleted_files.append(str(clip_file))
     return deleted_files
+
+
+# Background bulk-cleanup jobs live in the database, so any API worker can report them
+def create_cleanup_job(owner_id: int, video_ids: List[str]) -> str:
+    job_id = str(uuid.uuid4())
+    with Session(engine) as session:
+        db = DBClient(session)
+        db.prune_cleanup_jobs(datetime.utcnow() - timedelta(seconds=CLEANUP_JOB_TTL_SECONDS))
+        db.create_cleanup_job(CleanupJob(id=job_id, owner_id=owner_id, video_ids=json.dumps(list(video_ids))))
+    return job_id
+
+
+def get_cleanup_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with Session(engine) as session:
+        job = DBClient(session).get_cleanup_job(job_id)
+    if job is None:
+        return None
+    return {"job_id": job.id, "owner_id": job.owner_id, "status": job.status,
+            "video_ids": json.loads(job.video_ids), "deleted_files": job.deleted_files,
+            "error": job.error}
+
+
+def _update_cleanup_job(job_id: str, **fields):
+    with Session(engine) as session:
+        DBClient(session).update_cleanup_job(job_id, **fields)
+
+
+def delete_files_bulk(job_id: str, video_ids: List[str]):
+    """Remove videos and clips for many ids with one directory scan each."""
+    _update_cleanup_job(job_id, status="running")
+    ids = set(video_ids)
+    deleted_files = 0
+    try:
+        for video_file in UPLOAD_DIR.iterdir():
+            if video_file.is_file() and video_file.suffix in VIDEO_SUFFIXES and video_file.stem in ids:
+                video_file.unlink()
+                deleted_files += 1
+
+        for clip_file in CLIPS_DIR.iterdir():
+            if clip_file.is_file() and clip_file.suffix in VIDEO_SUFFIXES \
+                    and clip_file.stem.rsplit('_', 2)[0] in ids:
+                clip_file.unlink()
+                deleted_files += 1
+
+        for video_id in ids:
+            delete_video_artifacts(video_id)
+
+        _update_cleanup_job(job_id, status="completed", deleted_files=deleted_files)
+        logger.info(f"Bulk cleanup {job_id} removed {deleted_files} files")
+    except Exception as e:
+        _update_cleanup_job(job_id, status="failed", deleted_files=deleted_files, error=str(e))
+        logger.error(f"Bulk cleanup {job_id} failed: {e}")
+
+
+def encode_video_cursor(video: Video) -> str:
+    raw = f"{video.updated_at.isoformat()}|{video.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_video_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, video_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(updated_at), video_id
+    except Exception:
+        raise ValueError("Invalid video cursor")
+
+
+def progress_payload(video: Video, progress: Optional[IndexingProgress]) -> Dict[str, Any]:
+    payload = {"video_id": video.id, "status": video.status, "error": video.error}
+    if progress is not None:
+        payload.update(processed_seconds=progress.processed_seconds,
+                       duration_seconds=progress.duration_seconds,
+                       frames=progress.frames, fps=progress.fps, eta_seconds=progress.eta_seconds)
+        if progress.duration_seconds:
+            payload["percent"] = round(min(100.0, 100 * progress.processed_seconds / progress.duration_seconds), 1)
+    return payload
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _progress_tick(owner_id: int, watched: List[str]):
+    """Processing videos with progress, plus the final state of videos that left processing"""
+    with Session(engine) as session:
+        db = DBClient(session)
+        current = {video.id: progress_payload(video, progress)
+                        for video, progress in db.list_processing_progress(owner_id)}
+        finished = {}
+        for video_id in set(watched) - current.keys():
+            video = db.get_video(video_id)
+            finished[video_id] = progress_payload(video, db.get_progress(video_id)) if video \
+                                    else {"video_id": video_id, "status": "deleted"}
+        return current, finished
+
+
+async def progress_events(request: Request, owner_id: int):
+    """
+    Server-sent events for an owner's indexing jobs: a `progress` event whenever a
+    processing video's progress row changes and a `status` event when it finishes.
+    The database is read once per interval for all of the owner's videos, so this
+    works the same whether indexing runs in-process or in workers.
+    """
+    last_sent: Dict[str, Dict[str, Any]] = {}
+    last_event_at = time.monotonic()
+    while not await request.is_disconnected():
+        current, finished = await asyncio.to_thread(_progress_tick, owner_id, list(last_sent))
+        for video_id, payload in current.items():
+            if last_sent.get(video_id) != payload:
+                yield _sse("progress", payload)
+                last_event_at = time.monotonic()
+        for payload in finished.values():
+            yield _sse("status", payload)
+            last_event_at = time.monotonic()
+        last_sent = current
+
+        if time.monotonic() - last_event_at >= SSE_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            last_event_at = time.monotonic()
+        await asyncio.sleep(PROGRESS_STREAM_INTERVAL_SECONDS)
@@ -1,32 +1,71 @@
 import logging
-from app.services.vector_store import VectorStore
-from app.services.indexing import IndexingService
-from app.services.search import SearchService
-from app.config import CHROMA_DB_DIR
+import threading
+from typing import Optional, TYPE_CHECKING
+from app.config import CHROMA_DB_DIR, CHROMA_SERVER_HOST, CHROMA_SERVER_PORT
+
+if TYPE_CHECKING:
+    from app.services.vector_store import VectorStore
+    from app.services.indexing import IndexingService
+    from app.services.search import SearchService
 
 logger = logging.getLogger(__name__)
 
-# Singletons
+# Singletons, each with its own lock so a slow model load doesn't block the others
 _vector_store = None
 _indexing_service = None
 _search_service = None
+_vector_store_lock = threading.Lock()
+_indexing_service_lock = threading.Lock()
+_search_service_lock = threading.Lock()
+
+# Readiness
+_ready = threading.Event()
+_warmup_error: Optional[str] = None
 
-def get_vector_store() -> VectorStore:
+def get_vector_store() -> "VectorStore":
     global _vector_store
     if _vector_store is None:
-        _vector_store = VectorStore(persist_dir=str(CHROMA_DB_DIR))
+        with _vector_store_lock:
+            if _vector_store is None:
+                from app.services.vector_store import VectorStore
+                _vector_store = VectorStore(persist_dir=str(CHROMA_DB_DIR),
+                                            host=CHROMA_SERVER_HOST, port=CHROMA_SERVER_PORT)
     return _vector_store
 
-def get_indexing_service() -> IndexingService:
+def get_indexing_service() -> "IndexingService":
     global _indexing_service
     if _indexing_service is None:
-        vector_store = get_vector_store()
-        _indexing_service = IndexingService(vector_store)
+        with _indexing_service_lock:
+            if _indexing_service is None:
+                from app.services.indexing import IndexingService
+                vector_store = get_vector_store()
+                _indexing_service = IndexingService(vector_store)
     return _indexing_service
 
-def get_search_service() -> SearchService:
+def get_search_service() -> "SearchService":
     global _search_service
     if _search_service is None:
-        vector_store = get_vector_store()
-        _search_service = SearchService(vector_store)
+        with _search_service_lock:
+            if _search_service is None:
+                from app.services.search import SearchService
+                vector_store = get_vector_store()
+                _search_service = SearchService(vector_store)
     return _search_service
+
+def warm_up():
+    """Build the heavy singletons and run a dummy search so the first request is warm."""
+    global _warmup_error
+    try:
+        get_search_service().warm_up()
+        get_indexing_service()
+        _ready.set()
+        logger.info("Services warmed up and ready")
+    except Exception as e:
+        _warmup_error = str(e)
+        logger.error(f"Warm-up failed: {e}")
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def get_warmup_error() -> Optional[str]:
+    return _warmup_error
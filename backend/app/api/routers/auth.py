@@ -35,7 +35,7 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: DBClient
     except JWTError:
         raise credentials_exception
         
-    user = db.get_user_by_email(email)
+    user = db.get_cached_user_by_email(email)
     if user is None:
         raise credentials_exception
     return user
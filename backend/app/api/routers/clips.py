@@ -1,32 +1,57 @@
+import asyncio
 import logging
+from datetime import timedelta
 from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import FileResponse
-from app.api.security import verify_video_access_token
-from app.config import CLIPS_DIR
+from fastapi.responses import FileResponse, PlainTextResponse
+from app.api.security import (verify_video_access_token, create_video_access_token,
+                                VIDEO_ACCESS_SCOPE, HLS_SEGMENT_SCOPE)
+from app.services.tracing import start_trace, traced_stage
+from app.services.packaging import is_packaged, remux_clip, build_clip_playlist, segment_path
+from app.services.thumbnails import thumbnail_file
+from app.config import CLIPS_DIR, HLS_SEGMENT_TOKEN_TTL_SECONDS
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _parse_clip_id(clip_id: str):
+    parts = clip_id.rsplit('_', 2)
+    if len(parts) < 3:
+        raise HTTPException(status_code=400, detail="Invalid clip ID format")
+    try:
+        return parts[0], int(parts[1]), int(parts[2])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid clip ID format")
+
+
 @router.get("/clips/{clip_id}")
 async def get_clip(clip_id: str, token: str = Query(...)):
     """Serve a cut video clip (requires signed token)"""
     try:
-        parts = clip_id.rsplit('_', 2)
-        if len(parts) < 3:
-             raise HTTPException(status_code=400, detail="Invalid clip ID format")
-        
-        video_id = parts[0]
-        
-        if not verify_video_access_token(token, video_id):
-             raise HTTPException(status_code=403, detail="Invalid or expired video access token")
-
-        clip_path = CLIPS_DIR / f"{clip_id}.mp4"
-        if clip_path.exists():
+        with start_trace() as trace:
+            video_id, start_time, end_time = _parse_clip_id(clip_id)
+            
+            with traced_stage("auth"):
+                authorized = verify_video_access_token(token, video_id)
+            if not authorized:
+                 raise HTTPException(status_code=403, detail="Invalid or expired video access token")
+
+            with traced_stage("lookup"):
+                clip_path = CLIPS_DIR / f"{clip_id}.mp4"
+                clip_exists = clip_path.exists()
+
+            if not clip_exists and is_packaged(video_id):
+                # Stream-copy the covering segments; no re-encode, but ffmpeg still blocks
+                with traced_stage("remux"):
+                    clip_exists = await asyncio.to_thread(remux_clip, video_id, start_time,
+                                                            end_time, str(clip_path)) is not None
+
+        if clip_exists:
             return FileResponse(
                 path=str(clip_path),
                 media_type="video/mp4",
-                filename=f"{clip_id}.mp4"
+                filename=f"{clip_id}.mp4",
+                headers={"Server-Timing": trace.server_timing()}
             )
         raise HTTPException(status_code=404, detail="Clip not found")
     except HTTPException:
@@ -34,3 +59,51 @@ async def get_clip(clip_id: str, token: str = Query(...)):
     except Exception as e:
         logger.error(f"Get clip failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/clips/{clip_id}/playlist.m3u8")
+async def get_clip_playlist(clip_id: str, token: str = Query(...)):
+    """HLS playlist over the ingest-time segments covering a clip (requires signed token)"""
+    video_id, start_time, end_time = _parse_clip_id(clip_id)
+    if not verify_video_access_token(token, video_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired video access token")
+    if not is_packaged(video_id):
+        raise HTTPException(status_code=404, detail="Video is not packaged")
+
+    # The request token expires in minutes; segments get their own, outliving playback of the clip
+    ttl_seconds = max(HLS_SEGMENT_TOKEN_TTL_SECONDS, 2 * (end_time - start_time))
+    segment_token = create_video_access_token(video_id, timedelta(seconds=ttl_seconds), scope=HLS_SEGMENT_SCOPE)
+    playlist = build_clip_playlist(video_id, start_time, end_time,
+                                    lambda name: f"/api/hls/{video_id}/{name}?token={segment_token}")
+    if playlist is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    return PlainTextResponse(playlist, media_type="application/vnd.apple.mpegurl")
+
+
+@router.get("/hls/{video_id}/{filename}")
+async def get_hls_segment(video_id: str, filename: str, token: str = Query(...)):
+    """Serve an init or media segment of a packaged video (requires signed video or segment token)"""
+    if not verify_video_access_token(token, video_id, scopes=(VIDEO_ACCESS_SCOPE, HLS_SEGMENT_SCOPE)):
+        raise HTTPException(status_code=403, detail="Invalid or expired video access token")
+
+    path = segment_path(video_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    media_type = "video/mp4" if filename.endswith(".mp4") else "video/iso.segment"
+    return FileResponse(path=str(path), media_type=media_type,
+                        headers={"Cache-Control": "private, max-age=3600"})
+
+
+@router.get("/thumbnails/{video_id}/{filename}")
+async def get_thumbnails(video_id: str, filename: str, token: str = Query(...)):
+    """Serve a video's thumbnail sprite sheet or its tile index (requires signed token)"""
+    if not verify_video_access_token(token, video_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired video access token")
+
+    path = thumbnail_file(video_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnails not found")
+    media_type = "image/jpeg" if filename.endswith(".jpg") else "application/json"
+    # Sprites only change on re-indexing, and each signed token yields a fresh URL
+    return FileResponse(path=str(path), media_type=media_type,
+                        headers={"Cache-Control": "private, max-age=31536000, immutable"})
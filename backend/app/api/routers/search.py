@@ -1,25 +1,98 @@
 import logging
-from fastapi import APIRouter, Query, Depends, HTTPException
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException, Response
 from app.db.models import User
 from app.api.routers.auth import get_current_user
+from app.api.security import is_admin
 from app.services.search import SearchService
-from app.services.structs import Moment
+from app.services.structs import SearchPage, SearchFilters
+from app.services.tracing import start_trace
+from app.config import PROFILES_DIR
 from app.api import deps
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.get("/search", response_model=list[Moment])
+def _check_profiling(user: User, profile: bool, cprofile: bool):
+    if (profile or cprofile) and not is_admin(user.email):
+        raise HTTPException(status_code=403, detail="Profiling is restricted to admins")
+
+
+def search_filters(
+    video_id: Optional[List[str]] = Query(None),
+    detected: Optional[List[str]] = Query(None),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> Optional[SearchFilters]:
+    """Optional constraints applied inside the vector store rather than after retrieval"""
+    if not (video_id or detected or created_after or created_before):
+        return None
+    return SearchFilters(video_ids=video_id, classes=detected,
+                            created_after=created_after, created_before=created_before)
+
+
+def _profile_path(name: str):
+    return PROFILES_DIR / f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S%f}.prof"
+
+
+@router.get("/search", response_model=SearchPage)
 async def search(
-    q: str = Query(...), 
+    response: Response,
+    q: Optional[str] = Query(None), 
     limit: int = 10,
+    cursor: Optional[str] = None,
+    profile: bool = False,
+    cprofile: bool = False,
+    filters: Optional[SearchFilters] = Depends(search_filters),
     current_user: User = Depends(get_current_user),
     search_service: SearchService = Depends(deps.get_search_service)
 ):
+    """Filters only apply to a new query; cursor pages keep the filters of the original one."""
+    if not q and not cursor:
+        raise HTTPException(status_code=400, detail="Either 'q' or 'cursor' is required")
+    _check_profiling(current_user, profile, cprofile)
     try:
-        results = search_service.search_videos(q, owner_id=current_user.id, limit=limit)
-        return results
+        with start_trace(detailed=profile or cprofile,
+                            profile_path=_profile_path("search") if cprofile else None) as trace:
+            page = search_service.search_page(q, owner_id=current_user.id, limit=limit, cursor=cursor,
+                                                filters=filters)
+        response.headers["Server-Timing"] = trace.server_timing()
+        if trace.detailed:
+            page.trace = trace.to_dict()
+        return page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/similar/{frame_id}", response_model=SearchPage)
+async def search_similar(
+    frame_id: str,
+    response: Response,
+    limit: int = 10,
+    profile: bool = False,
+    cprofile: bool = False,
+    filters: Optional[SearchFilters] = Depends(search_filters),
+    current_user: User = Depends(get_current_user),
+    search_service: SearchService = Depends(deps.get_search_service)
+):
+    """Find moments similar to an indexed frame; page on with /search?cursor=..."""
+    _check_profiling(current_user, profile, cprofile)
+    try:
+        with start_trace(detailed=profile or cprofile,
+                            profile_path=_profile_path("similar") if cprofile else None) as trace:
+            page = search_service.search_similar(frame_id, owner_id=current_user.id, limit=limit,
+                                                    filters=filters)
+        response.headers["Server-Timing"] = trace.server_timing()
+        if trace.detailed:
+            page.trace = trace.to_dict()
+        return page
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Similar search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,6 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from app.db.models import User
 from app.api.routers.auth import get_current_user
 from app.db.engine import get_db, DBClient
@@ -9,6 +10,22 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """Readiness: models are loaded and the index is warm."""
+    if deps.is_ready():
+        return {"status": "ready"}
+    error = deps.get_warmup_error()
+    return JSONResponse(status_code=503, content={"status": "failed" if error else "warming_up",
+                                                   "error": error})
+
+
 @router.delete("/reset")
 async def reset_db(current_user: User = Depends(get_current_user)):
     return {"status": "reset_disabled_for_multiuser"}
@@ -3,16 +3,21 @@ import traceback
 from typing import List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, File, UploadFile, BackgroundTasks, HTTPException, Query, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, File, UploadFile, BackgroundTasks, HTTPException, Query, Depends, Request
+from fastapi.responses import StreamingResponse
 
 from app.db.engine import get_db, DBClient
-from app.db.models import User, Video
+from app.db.models import User, Video, VideoPage, BulkDeleteRequest
 from app.api.routers.auth import get_current_user
 from app.api import deps
 from app.config import UPLOAD_DIR, CLIPS_DIR
-from app.api.security import create_video_access_token, verify_video_access_token
-from app.api.api_utils import upload_video_file, delete_video_file, delete_clips, search_video_file
+from app.api.security import (create_video_access_token, verify_video_access_token,
+                                create_progress_stream_token, verify_progress_stream_token)
+from app.api.api_utils import (upload_video_file, delete_video_file, delete_clips, search_video_file,
+                                encode_video_cursor, decode_video_cursor, create_cleanup_job,
+                                get_cleanup_job, delete_files_bulk, resolve_video_path,
+                                delete_video_artifacts, video_media_type, ranged_file_response,
+                                progress_payload, progress_events)
 
 
 logger = logging.getLogger(__name__)
@@ -42,9 +47,7 @@ async def upload_video(
         )
         db.create_video(video)
         
-        if background_tasks:
-            background_tasks.add_task(indexing_service.index_video, str(file_path),
-                                         video_id, owner_id=current_user.id)
+        indexing_service.submit(background_tasks, str(file_path), video_id, owner_id=current_user.id)
         
         return {"video_id": video_id, 
                 "status": "uploaded_and_indexing_started", 
@@ -54,23 +57,115 @@ async def upload_video(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/videos", response_model=List[Video])
+@router.get("/videos", response_model=VideoPage)
 async def list_videos(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    changed_since: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
     db: DBClient = Depends(get_db)
 ):
-    """List all videos belonging to the current user"""
+    """
+    List videos belonging to the current user, newest change first.
+    Pass `limit` to page with `next_cursor`; pass `changed_since` to poll for updates only.
+    """
     try:
-        return db.list_videos_by_owner(current_user.id)
+        after = decode_video_cursor(cursor) if cursor else None
+        fetch_limit = limit + 1 if limit else None
+        videos = db.list_videos_by_owner(current_user.id, limit=fetch_limit, after=after,
+                                            status=status, changed_since=changed_since)
+
+        next_cursor = None
+        if limit and len(videos) > limit:
+            videos = videos[:limit]
+            next_cursor = encode_video_cursor(videos[-1])
+
+        return VideoPage(videos=videos, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"List videos failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/videos/progress/sign")
+async def sign_progress_stream(
+    current_user: User = Depends(get_current_user)
+):
+    """Generate a short-lived signed token for the progress stream"""
+    return {"token": create_progress_stream_token(current_user.id)}
+
+
+@router.get("/videos/progress/stream")
+async def stream_indexing_progress(
+    request: Request,
+    token: str = Query(...)
+):
+    """Server-sent events with indexing progress for the token owner's videos (requires signed token)"""
+    # EventSource cannot send an Authorization header, so the stream authenticates by query token
+    user_id = verify_progress_stream_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=403, detail="Invalid or expired progress stream token")
+    return StreamingResponse(progress_events(request, user_id), media_type="text/event-stream",
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/videos/{video_id}/progress")
+async def get_indexing_progress(
+    video_id: str,
+    current_user: User = Depends(get_current_user),
+    db: DBClient = Depends(get_db)
+):
+    """Latest indexing progress of one video"""
+    video = db.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    if video.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this video")
+
+    return progress_payload(video, db.get_progress(video_id))
+
+
+@router.post("/videos/{video_id}/cancel")
+async def cancel_indexing(
+    video_id: str,
+    current_user: User = Depends(get_current_user),
+    indexing_service = Depends(deps.get_indexing_service),
+    db: DBClient = Depends(get_db)
+):
+    """Stop indexing a video; the video is kept and can be retried"""
+    try:
+        video = db.get_video(video_id)
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+
+        if video.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to cancel this video")
+
+        if video.status != "processing":
+            raise HTTPException(status_code=409, detail=f"Video is not being indexed (status: {video.status})")
+
+        # Either the run is in this process, or it is queued/leased for a worker
+        running_here = indexing_service.cancel(video_id)
+        dequeued = db.delete_indexing_job(video_id)
+        db.update_video_status(video_id, "failed", error="Indexing cancelled")
+
+        return {"status": "cancelled", "video_id": video_id,
+                "stopped_in_process": running_here, "dequeued": dequeued}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Cancel indexing failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/videos/{video_id}")
 async def delete_video(
     video_id: str, 
     current_user: User = Depends(get_current_user),
+    indexing_service = Depends(deps.get_indexing_service),
     vector_store = Depends(deps.get_vector_store),
     db: DBClient = Depends(get_db)
 ):
@@ -82,7 +177,10 @@ async def delete_video(
         if video.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to delete this video")
 
+        # Stop a still-running pipeline first so it can't write embeddings for a deleted id
+        indexing_service.cancel(video_id, reason="deleted")
         deleted_files = delete_video_file(video_id) + delete_clips(video_id)
+        delete_video_artifacts(video_id)
 
         try:
             vector_store.delete_by_video_id(video_id)
@@ -100,6 +198,58 @@ async def delete_video(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/videos/bulk-delete")
+async def bulk_delete_videos(
+    request: BulkDeleteRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    indexing_service = Depends(deps.get_indexing_service),
+    vector_store = Depends(deps.get_vector_store),
+    db: DBClient = Depends(get_db)
+):
+    """Delete many videos at once; file cleanup runs in the background"""
+    try:
+        requested = set(request.video_ids)
+        videos = db.get_videos(list(requested))
+
+        owned = [v for v in videos if v.owner_id == current_user.id]
+        owned_ids = [v.id for v in owned]
+        forbidden = [v.id for v in videos if v.owner_id != current_user.id]
+        not_found = sorted(requested - {v.id for v in videos})
+
+        for video_id in owned_ids:
+            indexing_service.cancel(video_id, reason="deleted")
+
+        try:
+            vector_store.delete_by_video_ids(owned_ids)
+        except Exception as e:
+            logger.warning(f"Failed to delete embeddings for {len(owned_ids)} videos: {e}")
+
+        db.delete_videos(owned)
+
+        job_id = create_cleanup_job(current_user.id, owned_ids)
+        background_tasks.add_task(delete_files_bulk, job_id, owned_ids)
+
+        return {"status": "deleted", "deleted": owned_ids, "forbidden": forbidden,
+                "not_found": not_found, "cleanup_job_id": job_id}
+    except Exception as e:
+        logger.error(f"Bulk delete failed: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/videos/bulk-delete/{job_id}")
+async def get_bulk_delete_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Report progress of a bulk delete's background file cleanup"""
+    job = get_cleanup_job(job_id)
+    if not job or job["owner_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Cleanup job not found")
+    return job
+
+
 @router.post("/videos/{video_id}/retry")
 async def retry_indexing(
     video_id: str, 
@@ -132,8 +282,7 @@ async def retry_indexing(
         except Exception as e:
             logger.warning(f"Failed to clear embeddings for {video_id}: {e}")
         
-        background_tasks.add_task(indexing_service.index_video, str(video_file),
-                                     video_id, owner_id=current_user.id)
+        indexing_service.submit(background_tasks, str(video_file), video_id, owner_id=current_user.id)
         
         return {"status": "retry_started", "video_id": video_id}
     except HTTPException:
@@ -172,38 +321,24 @@ async def sign_video_url(
 
 
 @router.get("/videos/{video_id}")
-async def get_video(video_id: str, token: str = Query(...)):
-    """Stream a video file (requires signed token)"""
+async def get_video(
+    video_id: str,
+    request: Request,
+    token: str = Query(...),
+    db: DBClient = Depends(get_db)
+):
+    """Stream a video file (requires signed token); supports range and conditional requests"""
     try:
-        logger.info(f"Streaming request for {video_id} with token {token[:20]}...")
         if not verify_video_access_token(token, video_id):
             logger.warning(f"Invalid token for video {video_id}")
             raise HTTPException(status_code=403, detail="Invalid or expired video access token")
 
-        logger.info(f"Token valid. searching for file in {UPLOAD_DIR}")
-        for video_file in UPLOAD_DIR.glob(f"{video_id}.*"):
-            if video_file.is_file():
-                logger.info(f"Found video file: {video_file}")
-                return FileResponse(
-                    path=str(video_file),
-                    media_type="video/mp4",
-                    filename=video_file.name
-                )
-        
-        # If we get here, no file was found
-        logger.error(f"Video file not found for ID {video_id} in {UPLOAD_DIR}")
-        try:
-            # Debug: List directory contents to see what's actually there
-            logger.info(f"UPLOAD_DIR absolute: {UPLOAD_DIR.resolve()}")
-            if UPLOAD_DIR.exists():
-                files = [f.name for f in UPLOAD_DIR.iterdir()]
-                logger.info(f"Contents of UPLOAD_DIR: {files}")
-            else:
-                logger.error("UPLOAD_DIR does not exist!")
-        except Exception as e:
-            logger.error(f"Failed to list directory: {e}")
-            
-        raise HTTPException(status_code=404, detail="Video file not found")
+        video_path = resolve_video_path(video_id, db)
+        if not video_path:
+            logger.error(f"Video file not found for ID {video_id}")
+            raise HTTPException(status_code=404, detail="Video file not found")
+
+        return ranged_file_response(request, video_path, video_media_type(video_path))
             
     except HTTPException:
         raise
@@ -1,8 +1,11 @@
+import time
+import threading
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Union, Dict, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 import logging
+from app.config import ADMIN_EMAILS
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +16,17 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Signed video URLs are re-sent on every range request while seeking;
+# remember verified tokens until they expire to skip repeated JWT decodes.
+VERIFIED_TOKEN_CACHE_MAX = 4096
+_verified_tokens: Dict[str, Tuple[str, str, float]] = {}
+
+# Token scopes: short-lived access to a whole video, or longer-lived access limited to
+# the HLS segments a clip playlist references
+VIDEO_ACCESS_SCOPE = "video_access"
+HLS_SEGMENT_SCOPE = "hls_segments"
+_verified_tokens_lock = threading.Lock()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     if len(plain_password) > 72:
@@ -26,6 +40,10 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def is_admin(email: str) -> bool:
+    return email in ADMIN_EMAILS
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -38,11 +56,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def create_video_access_token(video_id: str) -> str:
+def create_video_access_token(video_id: str, expires_delta: Optional[timedelta] = None,
+                                scope: str = VIDEO_ACCESS_SCOPE) -> str:
     """Create a short-lived token specifically for accessing a video"""
-    expire = datetime.utcnow() + timedelta(minutes=5) # 5 minutes validity
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=5)) # 5 minutes validity by default
     to_encode = {
-        "sub": "video_access",
+        "sub": scope,
         "video_id": video_id,
         "exp": expire
     }
@@ -50,14 +69,53 @@ def create_video_access_token(video_id: str) -> str:
     return encoded_jwt
 
 
-def verify_video_access_token(token: str, video_id: str) -> bool:
-    """Verify if a token grants access to a specific video"""
+def create_progress_stream_token(user_id: int) -> str:
+    """Create a short-lived token for the progress event stream (EventSource can't send headers)"""
+    expire = datetime.utcnow() + timedelta(minutes=5) # only needed to open (or reopen) the stream
+    to_encode = {
+        "sub": "progress_stream",
+        "user_id": user_id,
+        "exp": expire
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_progress_stream_token(token: str) -> Optional[int]:
+    """The user a progress stream token was issued to, or None if it is invalid or expired"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError:
+        return None
+    if payload.get("sub") != "progress_stream":
+        return None
+    return payload.get("user_id")
+
+
+def verify_video_access_token(token: str, video_id: str,
+                                scopes: Tuple[str, ...] = (VIDEO_ACCESS_SCOPE,)) -> bool:
+    """Verify if a token grants access to a specific video, with one of the accepted scopes"""
+    now = time.time()
+    with _verified_tokens_lock:
+        cached = _verified_tokens.get(token)
+    if cached is not None:
+        cached_scope, cached_video_id, expires_at = cached
+        if now < expires_at:
+            return cached_scope in scopes and cached_video_id == video_id
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("sub") != "video_access":
+        if payload.get("sub") not in scopes:
             return False
         if payload.get("video_id") != video_id:
             return False
-        return True
     except jwt.JWTError:
         return False
+
+    with _verified_tokens_lock:
+        if len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_MAX:
+            for key in [k for k, (_, _, exp) in _verified_tokens.items() if exp <= now]:
+                del _verified_tokens[key]
+            if len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_MAX:
+                _verified_tokens.clear()
+        _verified_tokens[token] = (payload["sub"], video_id, float(payload["exp"]))
+    return True
@@ -8,26 +8,132 @@ DATA_DIR = BASE_DIR / "data"
 # Storage Paths
 UPLOAD_DIR = DATA_DIR / "videos"
 CLIPS_DIR = DATA_DIR / "clips"
+MANIFEST_DIR = DATA_DIR / "manifests"
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
+PROFILES_DIR = DATA_DIR / "profiles"
+HLS_DIR = DATA_DIR / "hls"
+THUMBNAILS_DIR = DATA_DIR / "thumbnails"
+PROXY_DIR = DATA_DIR / "proxies"
 CHROMA_DB_DIR = BASE_DIR / "chroma_db"
 
 # Create directories
-for d in [UPLOAD_DIR, CLIPS_DIR]:
+for d in [UPLOAD_DIR, CLIPS_DIR, MANIFEST_DIR, SNAPSHOT_DIR, HLS_DIR, THUMBNAILS_DIR, PROXY_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
+# Admin users (comma-separated emails) allowed to use request profiling
+ADMIN_EMAILS = {e.strip() for e in os.getenv("VANTAGE_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# Database
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 20
+DB_POOL_TIMEOUT_SECONDS = 30
+DB_BUSY_TIMEOUT_MS = 5000
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_MAX_ENTRIES = 1024
+CLEANUP_JOB_TTL_SECONDS = 24 * 3600  # bulk-delete job status is pruned after this
+
 # Vector Store
 VECTOR_COLLECTION_NAME = "video_frames"
+# Chroma server shared by the API and indexing workers; unset embeds Chroma in-process at
+# CHROMA_DB_DIR, whose HNSW index is private to one process
+CHROMA_SERVER_HOST = os.getenv("VANTAGE_CHROMA_HOST", "")
+CHROMA_SERVER_PORT = int(os.getenv("VANTAGE_CHROMA_PORT", "8000"))
+VECTOR_BATCH_SIZE = 4096
+# HNSW index parameters; construction params only apply when a collection is (re)built
+HNSW_SPACE = "cosine"
+HNSW_CONSTRUCTION_EF = 100
+HNSW_SEARCH_EF = 64
+HNSW_M = 16
 
 # Indexing
-INDEXING_TIMEOUT = 600
+INDEXING_TIMEOUT = 600  # used when a video's duration can't be probed
+# Otherwise the timeout scales with duration over the measured throughput (video s per wall s)
+INDEXING_INITIAL_THROUGHPUT = 2.0
+INDEXING_TIMEOUT_SAFETY_FACTOR = 3.0
+INDEXING_MIN_TIMEOUT = 120
+INDEXING_MAX_TIMEOUT = 4 * 3600
+PROGRESS_WRITE_INTERVAL_SECONDS = 3.0
+PROGRESS_STREAM_INTERVAL_SECONDS = 1.0
+INDEXING_STRIDE = 30  # frames between samples when indexing the original upload
+# Index a low-resolution constant-frame-rate proxy instead of the original
+PROXY_ENABLED = os.getenv("VANTAGE_INDEXING_PROXY", "1") == "1"
+PROXY_MAX_SIZE = 640  # long side in pixels; covers SigLIP2 (384) and detector (640) inputs
+PROXY_SAMPLE_SECONDS = 1.0
+# The proxy is encoded at the sampling rate, so the engine runs with stride 1 and
+# fully decodes only frames it actually samples
+PROXY_FPS = 1 / PROXY_SAMPLE_SECONDS
+
+# Out-of-process indexing: the API only enqueues and `python -m app.worker` claims jobs.
+# Requires CHROMA_SERVER_HOST so workers and the API write to and search the same index
+INDEXING_QUEUE_ENABLED = os.getenv("VANTAGE_INDEXING_QUEUE", "0") == "1"
+WORKER_LEASE_SECONDS = 60
+WORKER_HEARTBEAT_SECONDS = 15
+WORKER_POLL_SECONDS = 2
+WORKER_MAX_ATTEMPTS = 3
+# Each worker serves its own /metrics (indexing, ffmpeg, failures); 0 disables it
+WORKER_METRICS_PORT = int(os.getenv("VANTAGE_WORKER_METRICS_PORT", "9101"))
+
+# CPU isolation between indexing and search (0 keeps library defaults). Thread pools are
+# per process, so the INDEXING_* settings only apply to `python -m app.worker`; in-process
+# indexing shares the API's QUERY_THREADS budget and is throttled by admission control alone
+QUERY_THREADS = int(os.getenv("VANTAGE_QUERY_THREADS", "0"))
+INDEXING_THREADS = int(os.getenv("VANTAGE_INDEXING_THREADS", "0"))
+INDEXING_CPU_AFFINITY = os.getenv("VANTAGE_INDEXING_CPUS", "")
+INDEXING_NICENESS = int(os.getenv("VANTAGE_INDEXING_NICENESS", "0"))
+SEARCH_P95_TARGET_MS = float(os.getenv("VANTAGE_SEARCH_P95_TARGET_MS", "500"))
+ADMISSION_WINDOW_SECONDS = 30
+ADMISSION_BACKOFF_SECONDS = 0.25
+ADMISSION_MAX_PAUSE_SECONDS = 10
+# In queue mode API processes publish their search p95 to the database at this interval,
+# and workers re-read it no more often
+ADMISSION_PUBLISH_SECONDS = 2.0
+
+# Ingest-time HLS packaging (clips then become segment ranges instead of re-encodes)
+HLS_PACKAGING_ENABLED = os.getenv("VANTAGE_HLS_PACKAGING", "0") == "1"
+HLS_SEGMENT_SECONDS = 4
+# Segment URLs inside a clip playlist carry their own token, valid for at least this long
+# (or twice the clip length) so long or paused playback doesn't fail midway
+HLS_SEGMENT_TOKEN_TTL_SECONDS = 3600
+
+# Thumbnail sprite sheets built from indexing frames
+THUMBNAIL_WIDTH = 160
+SPRITE_COLUMNS = 10
+SPRITE_MAX_TILES = 600
+SPRITE_QUALITY = 80
 
 # Search
 SIGLIP2_MODEL_ID = "google/siglip2-base-patch16-384"
 TIME_PADDING_SECONDS = 0.5
 CLUSTER_BUFFER_SECONDS = 2.0
 CONFIDENCE_THRESHOLD = 0.4
+SIMILAR_FRAME_THRESHOLD = 0.7
 DETECTION_THRESHOLD = 0.6
 MAX_DETECTIONS = 10
+# Raw detections kept per frame so the two settings above apply at query time
+DETECTION_STORE_FLOOR = 0.05
+DETECTION_STORE_MAX = 100
+# Lowest confidence a search filter asks for; det_<class> filter fields are only written at or above it
+DETECTION_FILTER_FLOOR = DETECTION_THRESHOLD
+CLASS_NAMES_FILE = DATA_DIR / "detector_classes.json"
+# Query-to-class mapping in text-embedding space (see app/services/vocabulary.py)
+VOCABULARY_EMBEDDINGS_FILE = DATA_DIR / "detector_classes.npz"
+# Fallback until `scripts/calibrate_embedder.py --vocabulary` has written a calibrated value
+VOCABULARY_MATCH_THRESHOLD = 0.75
+VOCABULARY_MAX_MATCHES = 3
+VOCABULARY_MAX_PHRASES = 12  # query words/phrases embedded per search
+VOCABULARY_PHRASE_CACHE_SIZE = 4096
+VOCABULARY_BATCH_SIZE = 64  # class names per encoder request while embedding the vocabulary
+# Optional shared text-encoder server (see app/services/encoder_server.py)
+ENCODER_SOCKET_PATH = os.getenv("VANTAGE_ENCODER_SOCKET")
+ENCODER_TIMEOUT_SECONDS = 5.0
 CALIBRATION_FILE = Path(__file__).resolve().parent / "services" / "calibration_results.json"
+SEARCH_INITIAL_CANDIDATE_MULTIPLIER = 3
+SEARCH_CANDIDATE_GROWTH_FACTOR = 2
+SEARCH_MAX_CANDIDATES = 2000
+SEARCH_CURSOR_TTL_SECONDS = 300
+SEARCH_CURSOR_MAX_ENTRIES = 256
+# Cap on candidates plus moments held across all cursors (~2 KB of metadata each)
+SEARCH_CURSOR_MAX_RESULTS = 50000
 STOP_WORDS = {"a", "an", "the", "in", "on", "at", 
                "with", "by", "for", "of", "and",
                 "is", "are"}
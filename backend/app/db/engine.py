@@ -1,20 +1,96 @@
-from datetime import datetime
-from typing import Optional, List
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple
 from fastapi import Depends
+from sqlalchemy import event, and_, or_, update, delete, func
+from sqlalchemy.pool import QueuePool
 from sqlmodel import select
-from .models import User, UserCreate, Video
+from .models import User, UserCreate, Video, IndexingJob, IndexingProgress, IndexingThroughput, CleanupJob, SearchLoad
 from sqlmodel import SQLModel, create_engine, Session
+from app.config import (
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_BUSY_TIMEOUT_MS,
+    USER_CACHE_TTL_SECONDS,
+    USER_CACHE_MAX_ENTRIES
+)
 
 
 sqlite_file_name = "data/database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, echo=False, connect_args=connect_args)
+engine = create_engine(
+    sqlite_url,
+    echo=False,
+    connect_args=connect_args,
+    poolclass=QueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    pool_pre_ping=True
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets request reads proceed while indexing jobs write status updates
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+class UserCache:
+    """
+    Short-TTL in-process cache of users keyed by email (the JWT subject),
+    so authenticated requests skip the database round-trip.
+    """
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS,
+                        max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[User]:
+        with self._lock:
+            cached = self._entries.get(email)
+            if cached is None:
+                return None
+            user, expires_at = cached
+            if time.monotonic() > expires_at:
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return user
+
+    def put(self, email: str, user: User):
+        with self._lock:
+            self._entries[email] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+
+user_cache = UserCache()
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips indexes on tables that already exist
+    for index in Video.__table__.indexes:
+        index.create(engine, checkfirst=True)
 
 
 def get_session():
@@ -30,6 +106,17 @@ class DBClient:
     def get_user_by_email(self, email: str) -> Optional[User]:
         return self.session.exec(select(User).where(User.email == email)).first()
 
+    def get_cached_user_by_email(self, email: str) -> Optional[User]:
+        """Auth hot path: serve from the user cache, falling back to the database."""
+        user = user_cache.get(email)
+        if user is None:
+            user = self.get_user_by_email(email)
+            if user is not None:
+                # Detach so the cached instance outlives this session
+                self.session.expunge(user)
+                user_cache.put(email, user)
+        return user
+
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         return self.session.get(User, user_id)
 
@@ -38,6 +125,7 @@ class DBClient:
         self.session.add(new_user)
         self.session.commit()
         self.session.refresh(new_user)
+        user_cache.invalidate(new_user.email)
         return new_user
 
     # Video Methods
@@ -50,14 +138,48 @@ class DBClient:
     def get_video(self, video_id: str) -> Optional[Video]:
         return self.session.get(Video, video_id)
 
-    def list_videos_by_owner(self, owner_id: int) -> List[Video]:
-        statement = select(Video).where(Video.owner_id == owner_id).order_by(Video.updated_at.desc())
+    def list_videos_by_owner(self, owner_id: int, limit: Optional[int] = None,
+                                after: Optional[Tuple[datetime, str]] = None,
+                                status: Optional[str] = None,
+                                changed_since: Optional[datetime] = None) -> List[Video]:
+        """
+        Keyset-paginated listing ordered by (updated_at, id) descending, served by
+        the (owner_id, updated_at, id) index. `after` is the key of the last row seen.
+        """
+        statement = select(Video).where(Video.owner_id == owner_id)
+        if status:
+            statement = statement.where(Video.status == status)
+        if changed_since:
+            statement = statement.where(Video.updated_at > changed_since)
+        if after:
+            updated_at, video_id = after
+            statement = statement.where(or_(
+                Video.updated_at < updated_at,
+                and_(Video.updated_at == updated_at, Video.id < video_id)
+            ))
+        statement = statement.order_by(Video.updated_at.desc(), Video.id.desc())
+        if limit:
+            statement = statement.limit(limit)
+        return self.session.exec(statement).all()
+
+    def get_videos(self, video_ids: List[str]) -> List[Video]:
+        statement = select(Video).where(Video.id.in_(video_ids))
         return self.session.exec(statement).all()
 
     def delete_video(self, video: Video):
+        self.session.execute(delete(IndexingJob).where(IndexingJob.video_id == video.id))
+        self.session.execute(delete(IndexingProgress).where(IndexingProgress.video_id == video.id))
         self.session.delete(video)
         self.session.commit()
 
+    def delete_videos(self, videos: List[Video]):
+        video_ids = [v.id for v in videos]
+        self.session.execute(delete(IndexingJob).where(IndexingJob.video_id.in_(video_ids)))
+        self.session.execute(delete(IndexingProgress).where(IndexingProgress.video_id.in_(video_ids)))
+        for video in videos:
+            self.session.delete(video)
+        self.session.commit()
+
     def update_video_status(self, video_id: str, status: str, error: Optional[str] = None):
         video = self.session.get(Video, video_id)
         if video:
@@ -77,5 +199,132 @@ class DBClient:
         self.session.refresh(video)
         return video
 
+    # Indexing Queue Methods
+    def enqueue_indexing_job(self, video_id: str, owner_id: int, video_path: str) -> IndexingJob:
+        """
+        Queue (or re-queue) a video and reset its attempt count. The previous holder loses
+        the lease (its next renewal fails and it stops), but an unexpired lease still blocks
+        claims until it runs out, so the old run has stopped writing before a new one starts.
+        """
+        job = self.session.get(IndexingJob, video_id) or IndexingJob(video_id=video_id, owner_id=owner_id,
+                                                                     video_path=video_path)
+        job.video_path = video_path
+        job.attempts = 0
+        job.lease_owner = None
+        job.created_at = datetime.utcnow()
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    def claim_indexing_job(self, worker_id: str, lease_seconds: float) -> Optional[IndexingJob]:
+        """
+        Lease the oldest unleased (or expired) job to `worker_id`. The conditional
+        UPDATE is the atomic step: when two workers race, only one matches the row.
+        """
+        for _ in range(3):
+            now = datetime.utcnow()
+            claimable = or_(IndexingJob.lease_expires_at == None, IndexingJob.lease_expires_at < now)  # noqa: E711
+            candidate = self.session.exec(
+                select(IndexingJob.video_id).where(claimable).order_by(IndexingJob.created_at).limit(1)
+            ).first()
+            if candidate is None:
+                return None
+
+            result = self.session.execute(
+                update(IndexingJob)
+                .where(IndexingJob.video_id == candidate, claimable)
+                .values(lease_owner=worker_id,
+                        lease_expires_at=now + timedelta(seconds=lease_seconds),
+                        attempts=IndexingJob.attempts + 1)
+            )
+            self.session.commit()
+            if result.rowcount == 1:
+                job = self.session.get(IndexingJob, candidate)
+                self.session.refresh(job)
+                return job
+        return None
+
+    def renew_indexing_lease(self, video_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Heartbeat. Returns False when the lease was lost (expired and re-claimed, or the job deleted)."""
+        result = self.session.execute(
+            update(IndexingJob)
+            .where(IndexingJob.video_id == video_id, IndexingJob.lease_owner == worker_id)
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        self.session.commit()
+        return result.rowcount == 1
+
+    def get_indexing_job(self, video_id: str) -> Optional[IndexingJob]:
+        return self.session.get(IndexingJob, video_id)
+
+    def delete_indexing_job(self, video_id: str) -> bool:
+        """Dequeue a video; a worker holding it notices on its next heartbeat."""
+        result = self.session.execute(delete(IndexingJob).where(IndexingJob.video_id == video_id))
+        self.session.commit()
+        return result.rowcount == 1
+
+    # Indexing Progress Methods
+    def save_progress(self, progress: IndexingProgress):
+        self.session.merge(progress)
+        self.session.commit()
+
+    def get_progress(self, video_id: str) -> Optional[IndexingProgress]:
+        return self.session.get(IndexingProgress, video_id)
+
+    def get_indexing_throughput(self) -> Optional[float]:
+        row = self.session.get(IndexingThroughput, 1)
+        return row.throughput if row is not None else None
+
+    def save_indexing_throughput(self, throughput: float):
+        self.session.merge(IndexingThroughput(id=1, throughput=throughput, updated_at=datetime.utcnow()))
+        self.session.commit()
+
+    def list_processing_progress(self, owner_id: int) -> List[Tuple[Video, Optional[IndexingProgress]]]:
+        """The owner's videos still being indexed, with their latest progress if any."""
+        statement = (select(Video, IndexingProgress)
+                        .join(IndexingProgress, IndexingProgress.video_id == Video.id, isouter=True)
+                        .where(Video.owner_id == owner_id, Video.status == "processing"))
+        return list(self.session.exec(statement).all())
+
+    def complete_indexing_job(self, video_id: str, worker_id: str):
+        self.session.execute(
+            delete(IndexingJob).where(IndexingJob.video_id == video_id, IndexingJob.lease_owner == worker_id)
+        )
+        self.session.commit()
+
+    # Search Load Methods
+    def publish_search_load(self, source: str, p95_ms: Optional[float], stale_before: datetime):
+        """Upsert this process's search p95 and drop rows left by processes that stopped publishing."""
+        self.session.merge(SearchLoad(source=source, p95_ms=p95_ms, updated_at=datetime.utcnow()))
+        self.session.execute(delete(SearchLoad).where(SearchLoad.updated_at < stale_before))
+        self.session.commit()
+
+    def get_search_p95(self, since: datetime) -> Optional[float]:
+        """Worst recent p95 across API processes."""
+        statement = select(func.max(SearchLoad.p95_ms)).where(SearchLoad.updated_at >= since)
+        return self.session.exec(statement).one()
+
+    # Cleanup Job Methods
+    def create_cleanup_job(self, job: CleanupJob) -> CleanupJob:
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    def get_cleanup_job(self, job_id: str) -> Optional[CleanupJob]:
+        return self.session.get(CleanupJob, job_id)
+
+    def update_cleanup_job(self, job_id: str, **fields):
+        self.session.execute(
+            update(CleanupJob).where(CleanupJob.id == job_id).values(updated_at=datetime.utcnow(), **fields)
+        )
+        self.session.commit()
+
+    def prune_cleanup_jobs(self, older_than: datetime) -> int:
+        result = self.session.execute(delete(CleanupJob).where(CleanupJob.created_at < older_than))
+        self.session.commit()
+        return result.rowcount
+
 def get_db(session: Session = Depends(get_session)) -> DBClient:
     return DBClient(session)
@@ -1,5 +1,6 @@
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -23,6 +24,10 @@ class UserUpdate(SQLModel):
     password: Optional[str] = None
 
 class Video(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_video_owner_updated_id", "owner_id", "updated_at", "id"),
+    )
+
     id: str = Field(primary_key=True)
     owner_id: int = Field(foreign_key="user.id", index=True)
     video_path: str
@@ -32,3 +37,54 @@ class Video(SQLModel, table=True):
     error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IndexingJob(SQLModel, table=True):
+    """A queued indexing run, claimed by workers through an expiring lease."""
+    video_id: str = Field(primary_key=True)
+    owner_id: int
+    video_path: str
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IndexingProgress(SQLModel, table=True):
+    """Latest progress of a video's indexing run, written at most every few seconds."""
+    video_id: str = Field(primary_key=True)
+    owner_id: int = Field(index=True)
+    processed_seconds: float = 0.0
+    duration_seconds: Optional[float] = None
+    frames: int = 0
+    fps: float = 0.0  # frames persisted per wall-clock second
+    eta_seconds: Optional[float] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IndexingThroughput(SQLModel, table=True):
+    """Moving average of indexing throughput, shared by the API and workers across restarts."""
+    id: int = Field(default=1, primary_key=True)  # single row
+    throughput: float  # video seconds per second of pipeline time, throttle pauses excluded
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SearchLoad(SQLModel, table=True):
+    """Recent search p95 of one API process, read by indexing workers to throttle themselves."""
+    source: str = Field(primary_key=True)  # host:pid of the publishing process
+    p95_ms: Optional[float] = None  # None while the process saw no searches in the window
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class CleanupJob(SQLModel, table=True):
+    """Status of a bulk delete's background file cleanup, pruned after a day."""
+    id: str = Field(primary_key=True)
+    owner_id: int = Field(index=True)
+    video_ids: str  # JSON list
+    status: str = "pending"
+    deleted_files: int = 0
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class VideoPage(SQLModel):
+    videos: List[Video]
+    next_cursor: Optional[str] = None
+
+class BulkDeleteRequest(SQLModel):
+    video_ids: List[str]
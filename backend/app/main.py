@@ -1,10 +1,15 @@
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api.routers import videos, search, clips, system, auth
 from app.db.engine import create_db_and_tables
-from app.api.deps import get_vector_store
+from app.api import deps
+from app.config import INDEXING_QUEUE_ENABLED, CHROMA_SERVER_HOST
+from app.services.metrics import render_metrics
+from app.services.resources import apply_query_limits, warn_unapplied_indexing_limits, admission_controller
 
 # Configure logging
 logging.basicConfig(
@@ -29,9 +34,24 @@ app.include_router(system.router, prefix="/api", tags=["system"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # This process only: in queue mode, scrape each indexing worker's own /metrics too
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup_event():
+    if INDEXING_QUEUE_ENABLED and not CHROMA_SERVER_HOST:
+        raise RuntimeError("VANTAGE_INDEXING_QUEUE=1 needs a shared Chroma server; set VANTAGE_CHROMA_HOST")
     create_db_and_tables()
+    apply_query_limits()
+    warn_unapplied_indexing_limits()
+    if INDEXING_QUEUE_ENABLED:
+        # Indexing runs in worker processes, which throttle on the p95 published here
+        admission_controller.start_publishing()
+    # Load models and open the index off the event loop; /api/ready reports completion
+    asyncio.get_running_loop().run_in_executor(None, deps.warm_up)
     logging.info(f"Vantage-Search v{app.version} backend started successfully")
 
 
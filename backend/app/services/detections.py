@@ -0,0 +1,160 @@
+import re
+import json
+import base64
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from app.config import (
+    CLASS_NAMES_FILE,
+    DETECTION_THRESHOLD,
+    MAX_DETECTIONS,
+    DETECTION_STORE_FLOOR,
+    DETECTION_STORE_MAX,
+    DETECTION_FILTER_FLOOR
+)
+
+logger = logging.getLogger(__name__)
+
+# Raw per-frame detections are stored as one metadata string: base64 of the class ids
+# (uint16) followed by their confidences (float16), sorted by confidence. The derived
+# `detected_classes`/`class_confidences` fields are materialized from it, so detection
+# thresholds can change without re-running inference.
+
+_class_names: Optional[List[str]] = None
+_class_names_mtime: Optional[int] = None
+
+
+def encode_detections(boxes: List[Dict[str, Any]]) -> str:
+    boxes = sorted((b for b in boxes if b["conf"] >= DETECTION_STORE_FLOOR),
+                        key=lambda b: b["conf"], reverse=True)[:DETECTION_STORE_MAX]
+    class_ids = np.array([b["cls"] for b in boxes], dtype=np.uint16)
+    confidences = np.array([b["conf"] for b in boxes], dtype=np.float16)
+    return base64.b64encode(class_ids.tobytes() + confidences.tobytes()).decode("ascii")
+
+
+def decode_detections(encoded: str) -> Tuple[np.ndarray, np.ndarray]:
+    raw = base64.b64decode(encoded)
+    count = len(raw) // 4
+    class_ids = np.frombuffer(raw, dtype=np.uint16, count=count)
+    confidences = np.frombuffer(raw, dtype=np.float16, count=count, offset=count * 2).astype(np.float32)
+    return class_ids, confidences
+
+
+def stored_threshold(threshold: float) -> float:
+    """
+    A threshold as stored confidences see it. Confidences round-trip through float16
+    (a detection at 0.9 reads back as 0.8999), so thresholds get the same rounding
+    before being compared with decoded confidences or the det_<class> fields.
+    """
+    return round(float(np.float16(threshold)), 4)
+
+
+def materialize(class_ids: np.ndarray, confidences: np.ndarray, class_names: List[str],
+                    threshold: float = DETECTION_THRESHOLD,
+                    max_detections: int = MAX_DETECTIONS) -> Dict[str, float]:
+    """Classes (with their max confidence) among the top `max_detections` boxes above `threshold`."""
+    keep = confidences >= stored_threshold(threshold)
+    class_ids, confidences = class_ids[keep], confidences[keep]
+    order = np.argsort(-confidences, kind="stable")[:max_detections]
+
+    class_confidences = {}
+    for cls_idx, conf in zip(class_ids[order].tolist(), confidences[order].tolist()):
+        if cls_idx < len(class_names):
+            name = class_names[cls_idx]
+            class_confidences[name] = max(class_confidences.get(name, 0.0), round(conf, 4))
+    return class_confidences
+
+
+def derived_fields(class_confidences: Dict[str, float]) -> Dict[str, str]:
+    return {
+        "detected_classes": ", ".join(class_confidences),
+        "class_confidences": json.dumps(class_confidences)
+    }
+
+
+def class_field(class_name: str) -> str:
+    """Metadata key holding a class's max confidence in a frame, used by search filters."""
+    return "det_" + re.sub(r"\W+", "_", class_name.lower()).strip("_")
+
+
+def class_fields(class_ids: np.ndarray, confidences: np.ndarray, class_names: List[str],
+                    floor: float = DETECTION_FILTER_FLOOR) -> Dict[str, float]:
+    """
+    Typed per-class max confidence for the classes a filter can match (at or above
+    `floor`), rather than one key per stored low-confidence detection.
+    """
+    fields = {}
+    floor = stored_threshold(floor)
+    for cls_idx, conf in zip(class_ids.tolist(), confidences.tolist()):
+        if conf >= floor and cls_idx < len(class_names):
+            key = class_field(class_names[cls_idx])
+            fields[key] = max(fields.get(key, 0.0), round(conf, 4))
+    return fields
+
+
+def frame_classes(metadata: Dict[str, Any], threshold: float = DETECTION_THRESHOLD,
+                    max_detections: int = MAX_DETECTIONS) -> Dict[str, float]:
+    """
+    Class confidences of one stored frame, thresholded at query time from the raw
+    detections. Frames indexed before raw detections were kept fall back to the
+    materialized fields.
+    """
+    class_names = load_class_names()
+    if metadata.get("detections") and class_names:
+        return materialize(*decode_detections(metadata["detections"]), class_names,
+                            threshold, max_detections)
+    if not metadata.get("detected_classes"):
+        return {}
+    return json.loads(metadata.get("class_confidences") or "{}")
+
+
+def save_class_names(class_names: List[str]):
+    """Persist the detector vocabulary that stored class ids refer to (only when it changes)."""
+    class_names = list(class_names)
+    if class_names == load_class_names():
+        return
+    tmp_file = CLASS_NAMES_FILE.with_suffix(".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(class_names, f)
+    tmp_file.replace(CLASS_NAMES_FILE)
+    logger.info(f"Saved detector vocabulary ({len(class_names)} classes)")
+
+
+def load_class_names() -> Optional[List[str]]:
+    """The saved vocabulary, re-read only when another process (e.g. a worker) rewrote it."""
+    global _class_names, _class_names_mtime
+    try:
+        mtime = CLASS_NAMES_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _class_names_mtime:
+        with open(CLASS_NAMES_FILE) as f:
+            _class_names = json.load(f)
+        _class_names_mtime = mtime
+    return _class_names
+
+
+def rematerialize(metadata: Dict[str, Any], threshold: float = DETECTION_THRESHOLD,
+                    max_detections: int = MAX_DETECTIONS) -> bool:
+    """
+    Recompute a frame's derived detection fields in place. Frames indexed before raw
+    detections were kept only get filter fields, from their materialized confidences.
+    Returns False if nothing changed.
+    """
+    class_names = load_class_names()
+    if metadata.get("detections") and class_names:
+        class_ids, confidences = decode_detections(metadata["detections"])
+        metadata.update(derived_fields(materialize(class_ids, confidences, class_names, threshold, max_detections)))
+        metadata.update(class_fields(class_ids, confidences, class_names))
+        return True
+
+    fields = {}
+    for name, conf in json.loads(metadata.get("class_confidences") or "{}").items():
+        if conf >= stored_threshold(DETECTION_FILTER_FLOOR):
+            key = class_field(name)
+            fields[key] = max(fields.get(key, 0.0), conf)
+    if all(metadata.get(key) == conf for key, conf in fields.items()):
+        return False
+    metadata.update(fields)
+    return True
@@ -0,0 +1,135 @@
+import os
+import json
+import socket
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+from typing import List
+
+from app.services.resources import apply_query_limits
+from app.config import SIGLIP2_MODEL_ID, ENCODER_SOCKET_PATH, ENCODER_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+
+
+def _send_message(sock: socket.socket, payload: dict):
+    body = json.dumps(payload).encode()
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Encoder connection closed mid-message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_message(sock: socket.socket) -> dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+class EncoderClient:
+    """
+    Client for the local text-encoder server. One connection per request keeps
+    it safe to share across threads; failures surface as OSError/ValueError so
+    callers can fall back to a local model.
+    """
+    def __init__(self, socket_path: str = ENCODER_SOCKET_PATH, timeout: float = ENCODER_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def encode_text(self, text: str) -> List[float]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            _send_message(sock, {"text": text})
+            response = _recv_message(sock)
+
+        if "error" in response:
+            raise ValueError(f"Encoder server error: {response['error']}")
+        return response["embedding"]
+
+    def encode_texts(self, texts: List[str]) -> List[List[float]]:
+        """Encode a batch in one round trip (used for bulk work such as the class vocabulary)."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            _send_message(sock, {"texts": list(texts)})
+            response = _recv_message(sock)
+
+        if "error" in response:
+            raise ValueError(f"Encoder server error: {response['error']}")
+        return response["embeddings"]
+
+
+class _EncoderRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        try:
+            request = _recv_message(self.request)
+            if "texts" in request:
+                with self.server.lock:
+                    embeddings = [self.server.embedder.encode_text(text) for text in request["texts"]]
+                _send_message(self.request, {"embeddings": [[float(v) for v in e] for e in embeddings]})
+                return
+
+            with self.server.lock:
+                embedding = self.server.embedder.encode_text(request["text"])
+            _send_message(self.request, {"embedding": [float(v) for v in embedding]})
+        except Exception as e:
+            logger.error(f"Encoder request failed: {e}")
+            try:
+                _send_message(self.request, {"error": str(e)})
+            except OSError:
+                pass
+
+
+class EncoderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Hosts a single warm embedder behind a Unix socket so many API workers can
+    share one model copy. Inference is serialized with a lock.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embedder):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _EncoderRequestHandler)
+        self.embedder = embedder
+        self.lock = threading.Lock()
+
+
+def serve(socket_path: str = ENCODER_SOCKET_PATH, device: str = "cpu"):
+    apply_query_limits()
+    from vision_tools.core.tools.embedder import OVSigLIP2Embedder
+
+    embedder = OVSigLIP2Embedder(model_id=SIGLIP2_MODEL_ID, config={}, device=device)
+    embedder.load_tool({})
+    logger.info(f"Text encoder server listening on {socket_path}")
+
+    with EncoderServer(socket_path, embedder) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Shared text-encoder server")
+    parser.add_argument("--socket", type=str, default=ENCODER_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--device", type=str, default="cpu", help="Device (cpu/cuda)")
+
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("--socket is required when VANTAGE_ENCODER_SOCKET is not set")
+    serve(args.socket, args.device)
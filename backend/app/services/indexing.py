@@ -1,75 +1,267 @@
 import logging
 import os
-import json
+import uuid
+import time
 import asyncio
+import threading
+from datetime import timezone
+from typing import Dict, List, Optional
 import traceback
 
 from app.services.vector_store import VectorStore
-from app.config import INDEXING_TIMEOUT, DETECTION_THRESHOLD, MAX_DETECTIONS
+from app.services.manifest import FrameManifest, write_manifest, delete_manifest
+from app.services.packaging import package_video
+from app.services.thumbnails import SpriteBuilder, delete_thumbnails
+from app.services.resources import admission_controller
+from app.services.proxy import ProxyVideo, make_proxy, delete_proxy, probe_duration
+from app.services.progress import ProgressTracker, throughput_estimator
+from app.services.detections import (encode_detections, decode_detections, materialize, derived_fields,
+                                     class_fields, save_class_names)
+from app.config import (HLS_PACKAGING_ENABLED,
+                        INDEXING_QUEUE_ENABLED, INDEXING_STRIDE, PROXY_ENABLED, PROXY_SAMPLE_SECONDS)
+from app.services.metrics import (
+    INDEXING_FRAMES,
+    INDEXING_FRAMES_PER_SECOND,
+    INDEXING_QUEUE_DEPTH,
+    INDEXING_ACTIVE_PIPELINES,
+    INDEXING_VIDEO_SECONDS,
+    INDEXING_FAILURES
+)
 from app.db.engine import engine, DBClient
 from sqlmodel import Session
-from vision_tools.engine.video_engine import VideoInferenceEngine
-from vision_tools.core.tools.pipeline import VisionPipeline, PipelineConfig
 
 logger = logging.getLogger(__name__)
 
 
+class IndexingCancelled(Exception):
+    """Raised inside the inference loop once a job's cancellation token is set."""
+
+
+class IndexingJobHandle:
+    """
+    Cancellation token of one in-flight indexing run. Setting it stops frame writes at
+    the next callback and cancels the inference task, which unloads the pipeline.
+    `reason` decides the cleanup: "cancelled"/"deleted"/"timeout" purge partial
+    embeddings, "lease_lost" leaves them to the worker that took the job over.
+    """
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.reason: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.progress: Optional[ProgressTracker] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str):
+        if self.cancelled:
+            return
+        self.reason = reason
+        self._cancelled.set()
+        if self.task is not None and not self.task.done():
+            self.task.get_loop().call_soon_threadsafe(self.task.cancel)
+
+    def check(self):
+        if self.cancelled:
+            raise IndexingCancelled(f"Indexing of {self.video_id} cancelled ({self.reason})")
+
+
 class IndexingService:
 
     def __init__(self, vector_store: VectorStore):
         self.vector_store = vector_store
+        self._jobs: Dict[str, IndexingJobHandle] = {}
+        self._saved_class_names: Optional[List[str]] = None
+
+    def cancel(self, video_id: str, reason: str = "cancelled") -> bool:
+        """Cancel an in-flight run in this process. Returns False if none is running."""
+        handle = self._jobs.get(video_id)
+        if handle is None:
+            return False
+        logger.info(f"Cancelling indexing of {video_id} ({reason})")
+        handle.cancel(reason)
+        return True
+
+    def submit(self, background_tasks, video_path: str, video_id: str, owner_id: int):
+        """
+        Queue a video for indexing: in the database for `app.worker` processes when the
+        indexing queue is enabled, otherwise as an in-process background task.
+        """
+        if INDEXING_QUEUE_ENABLED:
+            with Session(engine) as session:
+                DBClient(session).enqueue_indexing_job(video_id, owner_id, video_path)
+            logger.info(f"Enqueued {video_id} for indexing workers")
+            return
+
+        INDEXING_QUEUE_DEPTH.inc()
+        background_tasks.add_task(self._index_queued_video, video_path, video_id, owner_id)
+
+    async def _index_queued_video(self, video_path: str, video_id: str, owner_id: int):
+        INDEXING_QUEUE_DEPTH.dec()
+        await self.index_video(video_path, video_id, owner_id)
 
     async def index_video(self, video_path: str, video_id: str, owner_id: int):
         """Index a video file by extracting embeddings and detecting objects"""
         if not os.path.exists(video_path):
             logger.error(f"Video not found: {video_path}")
+            INDEXING_FAILURES.inc(reason="missing_file")
             self._update_metadata(video_id, "failed", error="Video file not found")
             return
             
         logger.info(f"Starting indexing for {video_id} at {video_path}")
 
+        handle = IndexingJobHandle(video_id)
+        previous = self._jobs.get(video_id)
+        if previous is not None:
+            previous.cancel("superseded")
+        self._jobs[video_id] = handle
+
+        # Budget the run from the video's duration and the throughput measured so far
+        duration = await asyncio.to_thread(probe_duration, video_path)
+        timeout = await asyncio.to_thread(throughput_estimator.timeout_for, duration)
+        handle.progress = ProgressTracker(video_id, owner_id, duration)
+        await self._write_progress(handle.progress.snapshot())
+
+        start = time.perf_counter()
         try:
             # Run indexing with timeout
-            await asyncio.wait_for(
-                self._run_indexing(video_path, video_id, owner_id),
-                timeout=INDEXING_TIMEOUT
-            )
+            with INDEXING_ACTIVE_PIPELINES.track_inprogress():
+                handle.task = asyncio.ensure_future(self._run_indexing(video_path, video_id, owner_id, handle))
+                frame_count = await self._wait_within_budget(handle, timeout)
             
+            elapsed = time.perf_counter() - start
+            INDEXING_VIDEO_SECONDS.observe(elapsed)
+            INDEXING_FRAMES_PER_SECOND.set(frame_count / elapsed if elapsed > 0 else 0.0)
+            # Throttled runs would otherwise drag the estimate (and later timeouts) down
+            await asyncio.to_thread(throughput_estimator.record, duration, handle.progress.working_seconds())
+
+            if HLS_PACKAGING_ENABLED:
+                try:
+                    await asyncio.to_thread(package_video, video_path, video_id)
+                except Exception as e:
+                    # Search still works; clips fall back to per-request cuts
+                    logger.warning(f"HLS packaging failed for {video_id}: {e}")
+
+            # A cancel that arrived during packaging still wins over completion
+            handle.check()
+            final = handle.progress.snapshot()
+            final.processed_seconds, final.eta_seconds = duration or final.processed_seconds, 0.0
+            await self._write_progress(final)
             # Update metadata to completed
             self._update_metadata(video_id, "completed")
             
         except asyncio.TimeoutError:
-            logger.error(f"Indexing timed out after {INDEXING_TIMEOUT}s for {video_id}")
-            self._update_metadata(video_id, "failed", error=f"Indexing timed out after {INDEXING_TIMEOUT // 60} minutes")
+            logger.error(f"Indexing timed out after {timeout:.0f}s for {video_id} "
+                            f"(duration {duration}s, throughput {throughput_estimator.throughput:.2f}x, "
+                            f"paused {handle.progress.paused_seconds:.0f}s)")
+            handle.cancel("timeout")
+            INDEXING_FAILURES.inc(reason="timeout")
+            await self._purge_partial_index(video_id)
+            self._update_metadata(video_id, "failed", error=f"Indexing timed out after {timeout / 60:.0f} minutes")
+
+        except (IndexingCancelled, asyncio.CancelledError):
+            if not handle.cancelled:
+                raise  # the caller itself was cancelled
+            logger.info(f"Indexing of {video_id} stopped ({handle.reason})")
+            INDEXING_FAILURES.inc(reason="cancelled")
+            if handle.reason in ("cancelled", "deleted"):
+                await self._purge_partial_index(video_id)
+            if handle.reason == "cancelled":
+                self._update_metadata(video_id, "failed", error="Indexing cancelled")
             
         except Exception as e:
             logger.error(f"Indexing failed for {video_id}: {e}")
             logger.error(traceback.format_exc())
+            INDEXING_FAILURES.inc(reason=type(e).__name__)
             self._update_metadata(video_id, "failed", error=str(e))
 
-    async def _run_indexing(self, video_path: str, video_id: str, owner_id: int):
-        """Internal method to run the actual indexing process"""
+        finally:
+            if self._jobs.get(video_id) is handle:
+                del self._jobs[video_id]
+
+    @staticmethod
+    async def _wait_within_budget(handle: IndexingJobHandle, timeout: float):
+        """
+        Like asyncio.wait_for, but only pipeline time counts against `timeout`: the
+        deadline moves out by however long admission control has paused the run.
+        """
+        try:
+            while True:
+                remaining = timeout - handle.progress.working_seconds()
+                if remaining <= 0:
+                    handle.task.cancel()
+                    await asyncio.wait({handle.task})
+                    raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait({handle.task}, timeout=remaining)
+                if done:
+                    return handle.task.result()
+        except asyncio.CancelledError:
+            handle.task.cancel()  # the caller was cancelled; don't leave the run behind
+            raise
+
+    async def _write_progress(self, progress):
+        """Progress is informational; a failed write never fails indexing"""
+        try:
+            await asyncio.to_thread(self._save_progress, progress)
+        except Exception as e:
+            logger.warning(f"Failed to write progress for {progress.video_id}: {e}")
+
+    @staticmethod
+    def _save_progress(progress):
+        with Session(engine) as session:
+            DBClient(session).save_progress(progress)
+
+    async def _purge_partial_index(self, video_id: str):
+        """Drop embeddings a stopped run already wrote, so they never show up in search"""
+        try:
+            await asyncio.to_thread(self.vector_store.delete_by_video_id, video_id)
+        except Exception as e:
+            logger.warning(f"Failed to purge partial embeddings for {video_id}: {e}")
+
+    async def _run_indexing(self, video_path: str, video_id: str, owner_id: int,
+                                handle: IndexingJobHandle = None) -> int:
+        """Internal method to run the actual indexing process. Returns the number of frames stored."""
+        from vision_tools.engine.video_engine import VideoInferenceEngine
+        from vision_tools.core.tools.pipeline import VisionPipeline, PipelineConfig
+
+        # A re-claimed or retried job starts from nothing: drop whatever an earlier run of
+        # this video wrote (a crashed worker, or a lease_lost run that skipped its purge)
+        await asyncio.to_thread(self.vector_store.delete_by_video_id, video_id)
+
+        proxy = await self._prepare_proxy(video_path, video_id)
+        source_path = str(proxy.path) if proxy else video_path
+        stride = max(1, round(proxy.fps * PROXY_SAMPLE_SECONDS)) if proxy else INDEXING_STRIDE
+
         pipeline_config = PipelineConfig(
             tool_settings={
                 "ov_embedding": {
-                    "trigger": {"type": "stride", "value": 30}
+                    "trigger": {"type": "stride", "value": stride}
                 },
                 "ov_detection": {
                     "prompt_free": True, 
-                    "trigger": {"type": "stride", "value": 30}
+                    "trigger": {"type": "stride", "value": stride}
                 }
             }
         )
 
         pipeline = VisionPipeline(pipeline_config)
+        created_at = self._video_created_at(video_id)
         errors = []
+        manifest = FrameManifest(video_id)
+        sprite = SpriteBuilder(video_id)
+        delete_manifest(video_id)
+        delete_thumbnails(video_id)
         try:
-            engine = VideoInferenceEngine(pipeline, video_path)
+            engine = VideoInferenceEngine(pipeline, source_path)
             
             logger.info(f"Running inference engine for {video_id}...")
             
             async for _ in engine.run_inference(
-                on_data=lambda data: self._persist_inference_data(data, video_id, video_path, owner_id, errors), 
+                on_data=lambda data: self._persist_inference_data(data, video_id, video_path, owner_id,
+                                                                     errors, manifest, sprite, proxy,
+                                                                     created_at, handle), 
                 buffer_delay=0, 
                 realtime=False
             ):
@@ -78,55 +270,99 @@ class IndexingService:
             if errors:
                 logger.error(f"Inference loop finished but errors were captured: {errors[0]}")
                 raise errors[0]
+            if handle is not None:
+                handle.check()
             
             logger.info(f"Finished current inference pass for {video_id}")
+
+            try:
+                write_manifest(manifest, owner_id)
+            except Exception as e:
+                # The index is complete without it; only fast rebuilds are affected
+                logger.warning(f"Failed to write frame manifest for {video_id}: {e}")
+
+            try:
+                sprite.write()
+            except Exception as e:
+                logger.warning(f"Failed to write sprite sheet for {video_id}: {e}")
+
+            return len(manifest)
         finally:
             # Cleanup must always happen
             pipeline.unload_tools()
             logger.info(f"Unloaded indexing tools for {video_id}")
+            if proxy:
+                delete_proxy(video_id)
 
-    async def _persist_inference_data(self, data, video_id: str, video_path: str, owner_id: int, errors: list):
+    async def _prepare_proxy(self, video_path: str, video_id: str):
+        """Transcode the indexing proxy; on failure index the original instead."""
+        if not PROXY_ENABLED:
+            return None
+        try:
+            return await asyncio.to_thread(make_proxy, video_path, video_id)
+        except Exception as e:
+            logger.warning(f"Proxy transcode failed for {video_id}, indexing the original: {e}")
+            return None
+
+    async def _persist_inference_data(self, data, video_id: str, video_path: str, owner_id: int,
+                                        errors: list, manifest: FrameManifest = None,
+                                        sprite: SpriteBuilder = None, proxy: ProxyVideo = None,
+                                        created_at: float = None, handle: IndexingJobHandle = None):
         """Persist inference results to vector store"""
         tools_run = data.get('tools_run')
         if not tools_run:
             return
+
+        # Back off between frames while interactive search is over its latency target
+        paused = await admission_controller.wait_for_capacity()
+        if paused and handle is not None and handle.progress is not None:
+            handle.progress.pause(paused)
         
         timestamp = data['metadata']['timestamp']
+        if proxy is not None:
+            # Stored timestamps always refer to the original upload
+            timestamp = proxy.to_source_time(timestamp)
         metadata = {
             "video_id": video_id,
             "timestamp": timestamp,
             "video_path": video_path,
             "owner_id": owner_id
         }
+        if created_at is not None:
+            metadata["created_at"] = created_at
         
         try:
             # Extract tags if present (detection tool)
             if "boxes" in data:
-                # Sort boxes by confidence and take only those above threshold and maximum MAX_DETECTIONS
-                valid_boxes = [box for box in data["boxes"] if box["conf"] >= DETECTION_THRESHOLD]            
-                valid_boxes.sort(key=lambda box: box["conf"], reverse=True)
-                valid_boxes = valid_boxes[:MAX_DETECTIONS]
-
-                class_indices = list(set([box["cls"] for box in valid_boxes]))
+                # Keep the raw detections; the thresholded class fields are derived from them
                 class_names = data.get("class_names", [])
-                classes = [class_names[i] for i in class_indices if i < len(class_names)]
-                
-                class_confidences = {}
-                if classes:
-                    for box in valid_boxes:
-                        cls_idx = box["cls"]
-                        conf = float(box["conf"])
-                        if cls_idx < len(class_names):
-                            cls_name = class_names[cls_idx]
-                            # Keep max confidence for each class
-                            class_confidences[cls_name] = max(class_confidences.get(cls_name, 0.0), conf)
-                
-                metadata["detected_classes"] = ", ".join(classes)
-                metadata["class_confidences"] = json.dumps(class_confidences)
+                if class_names and class_names != self._saved_class_names:
+                    # The detector vocabulary is fixed per pipeline: write it once, not per frame
+                    save_class_names(class_names)
+                    self._saved_class_names = list(class_names)
+                metadata["detections"] = encode_detections(data["boxes"])
+                class_ids, confidences = decode_detections(metadata["detections"])
+                metadata.update(derived_fields(materialize(class_ids, confidences, class_names)))
+                # Typed per-class fields let search filters require classes in the index itself
+                metadata.update(class_fields(class_ids, confidences, class_names))
             
             # Store Embedding with metadata
             if "embedding" in data:
-                self.vector_store.add_embedding(data["embedding"], metadata)
+                # Checked right before the write (no await in between): a cancelled or
+                # superseded run must not add frames after its successor purged the video
+                if handle is not None:
+                    handle.check()
+                frame_id = str(uuid.uuid4())
+                self.vector_store.add_embedding(data["embedding"], metadata, id=frame_id)
+                INDEXING_FRAMES.inc()
+                if handle is not None and handle.progress is not None:
+                    row = handle.progress.update(timestamp)
+                    if row is not None:
+                        await self._write_progress(row)
+                if manifest is not None:
+                    manifest.add(frame_id, data["embedding"], metadata)
+                if sprite is not None and data.get("frame") is not None:
+                    self._add_thumbnail(sprite, timestamp, data["frame"])
 
         except Exception as e:
             logger.error(f"Error persisting inference data for {video_id}: {e}")
@@ -134,6 +370,24 @@ class IndexingService:
             errors.append(e)
             raise e # Re-raise to ensure the process fails
 
+    @staticmethod
+    def _add_thumbnail(sprite: SpriteBuilder, timestamp: float, frame):
+        """Thumbnails are best-effort and must never fail indexing"""
+        try:
+            sprite.add(timestamp, frame)
+        except Exception as e:
+            logger.warning(f"Skipping thumbnail at {timestamp}s for {sprite.video_id}: {e}")
+
+    def _video_created_at(self, video_id: str):
+        """Upload time as epoch seconds, stored per frame for date-range search filters"""
+        try:
+            with Session(engine) as session:
+                video = DBClient(session).get_video(video_id)
+                return video.created_at.replace(tzinfo=timezone.utc).timestamp() if video else None
+        except Exception as e:
+            logger.warning(f"Could not read upload time for {video_id}: {e}")
+            return None
+
     def _update_metadata(self, video_id: str, status: str, error: str = None):
         """Update the metadata for a video in the database"""
         try:
@@ -0,0 +1,120 @@
+import json
+import shutil
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Iterator
+import numpy as np
+
+from app.config import MANIFEST_DIR
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+COLUMNS_FILE = "columns.npz"
+INFO_FILE = "manifest.json"
+
+_PRESENT_PREFIX = "__present__"
+
+
+class FrameManifest:
+    """
+    Accumulates the frames persisted for one video so they can be written as a
+    compact manifest once indexing succeeds.
+    """
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.ids: List[str] = []
+        self.embeddings: List[List[float]] = []
+        self.metadatas: List[Dict[str, Any]] = []
+
+    def add(self, id: str, embedding: List[float], metadata: Dict[str, Any]):
+        self.ids.append(id)
+        self.embeddings.append(embedding)
+        self.metadatas.append(dict(metadata))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def save_frames(directory: Path, ids: List[str], embeddings, metadatas: List[Dict[str, Any]],
+                    info: Dict[str, Any] = None):
+    """
+    Write frames as `embeddings.npy` plus typed columnar metadata in `columns.npz`.
+    The directory is written next to its final location and swapped in at the end.
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / EMBEDDINGS_FILE, np.asarray(embeddings, dtype=np.float32))
+    np.savez(tmp_dir / COLUMNS_FILE, __ids__=np.asarray(ids, dtype=str), **_to_columns(metadatas))
+
+    info = dict(info or {})
+    info["count"] = len(ids)
+    with open(tmp_dir / INFO_FILE, "w") as f:
+        json.dump(info, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp_dir.rename(directory)
+
+
+def load_frames(directory: Path) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    directory = Path(directory)
+    embeddings = np.load(directory / EMBEDDINGS_FILE)
+    with np.load(directory / COLUMNS_FILE) as columns:
+        ids = columns["__ids__"].tolist()
+        metadatas = _from_columns({k: columns[k] for k in columns.files if k != "__ids__"}, len(ids))
+    return ids, embeddings, metadatas
+
+
+def write_manifest(manifest: FrameManifest, owner_id: int):
+    if not len(manifest):
+        logger.warning(f"No frames to write in manifest for {manifest.video_id}")
+        return
+    save_frames(MANIFEST_DIR / manifest.video_id, manifest.ids, manifest.embeddings,
+                    manifest.metadatas, info={"video_id": manifest.video_id, "owner_id": owner_id})
+    logger.info(f"Wrote frame manifest for {manifest.video_id} ({len(manifest)} frames)")
+
+
+def delete_manifest(video_id: str):
+    shutil.rmtree(MANIFEST_DIR / video_id, ignore_errors=True)
+
+
+def iter_manifests() -> Iterator[Path]:
+    for directory in sorted(MANIFEST_DIR.iterdir()):
+        if directory.is_dir() and (directory / INFO_FILE).exists():
+            yield directory
+
+
+def _to_columns(metadatas: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    keys = sorted({k for meta in metadatas for k in meta})
+    columns = {}
+    for key in keys:
+        present = [key in meta for meta in metadatas]
+        values = [meta.get(key) for meta in metadatas]
+        present_values = [v for v, p in zip(values, present) if p]
+
+        if all(isinstance(v, int) and not isinstance(v, bool) for v in present_values):
+            column = np.array([v if p else 0 for v, p in zip(values, present)], dtype=np.int64)
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present_values):
+            column = np.array([v if p else 0.0 for v, p in zip(values, present)], dtype=np.float64)
+        else:
+            column = np.array([str(v) if p else "" for v, p in zip(values, present)], dtype=str)
+
+        columns[key] = column
+        if not all(present):
+            columns[_PRESENT_PREFIX + key] = np.array(present, dtype=bool)
+    return columns
+
+
+def _from_columns(columns: Dict[str, np.ndarray], count: int) -> List[Dict[str, Any]]:
+    metadatas = [{} for _ in range(count)]
+    for key, column in columns.items():
+        if key.startswith(_PRESENT_PREFIX):
+            continue
+        present = columns.get(_PRESENT_PREFIX + key)
+        for i, value in enumerate(column.tolist()):
+            if present is None or present[i]:
+                metadatas[i][key] = value
+    return metadatas
@@ -0,0 +1,176 @@
+import os
+import math
+import shutil
+import logging
+import subprocess
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.config import HLS_DIR, HLS_SEGMENT_SECONDS
+from .metrics import FFMPEG_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_FILE = "index.m3u8"
+INIT_FILE = "init.mp4"
+
+# (start_time, duration, filename)
+Segment = Tuple[float, float, str]
+
+
+def package_dir(video_id: str) -> Path:
+    return HLS_DIR / video_id
+
+
+def is_packaged(video_id: str) -> bool:
+    return (package_dir(video_id) / PLAYLIST_FILE).exists()
+
+
+def package_video(video_path: str, video_id: str) -> Path:
+    """
+    Encode a video once into fixed-duration fMP4 HLS segments. Keyframes are forced on
+    segment boundaries so any time range maps onto whole segments.
+    """
+    target = package_dir(video_id)
+    tmp_dir = target.with_name(video_id + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i", video_path,
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-crf", "23",
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "-c:a", "aac",
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_flags", "independent_segments",
+        "-hls_fmp4_init_filename", INIT_FILE,
+        "-hls_segment_filename", str(tmp_dir / "seg_%05d.m4s"),
+        str(tmp_dir / PLAYLIST_FILE)
+    ]
+
+    logger.info(f"Packaging {video_id} into {HLS_SEGMENT_SECONDS}s HLS segments")
+    try:
+        with FFMPEG_ACTIVE.track_inprogress():
+            subprocess.run(command, check=True, capture_output=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(target, ignore_errors=True)
+    tmp_dir.rename(target)
+    return target
+
+
+def delete_package(video_id: str):
+    shutil.rmtree(package_dir(video_id), ignore_errors=True)
+
+
+def load_segments(video_id: str) -> List[Segment]:
+    playlist = package_dir(video_id) / PLAYLIST_FILE
+    return list(_parse_playlist(str(playlist), playlist.stat().st_mtime_ns))
+
+
+@lru_cache(maxsize=256)
+def _parse_playlist(path: str, mtime_ns: int) -> Tuple[Segment, ...]:
+    segments = []
+    position = 0.0
+    duration = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((position, duration, line))
+                position += duration
+                duration = None
+    return tuple(segments)
+
+
+def covering_segments(video_id: str, start_time: float, end_time: float) -> List[Segment]:
+    """Segments overlapping [start_time, end_time]."""
+    return [seg for seg in load_segments(video_id)
+                if seg[0] <= end_time and seg[0] + seg[1] > start_time]
+
+
+def clip_bounds(video_id: str, start_time: float, end_time: float) -> Optional[Tuple[float, float]]:
+    """Segment-aligned (start, end) actually served for a requested range."""
+    segments = covering_segments(video_id, start_time, end_time)
+    if not segments:
+        return None
+    return segments[0][0], segments[-1][0] + segments[-1][1]
+
+
+def build_clip_playlist(video_id: str, start_time: float, end_time: float, uri_for) -> Optional[str]:
+    """
+    A VOD media playlist over just the segments covering the range. `uri_for(filename)`
+    maps segment and init file names to URLs.
+    """
+    segments = covering_segments(video_id, start_time, end_time)
+    if not segments:
+        return None
+
+    target_duration = max(math.ceil(seg[1]) for seg in segments)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        f'#EXT-X-MAP:URI="{uri_for(INIT_FILE)}"',
+    ]
+    for _, duration, filename in segments:
+        lines.append(f"#EXTINF:{duration:.3f},")
+        lines.append(uri_for(filename))
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def segment_path(video_id: str, filename: str) -> Optional[Path]:
+    """Path of a packaged file, restricted to the init segment and playlist entries."""
+    if not is_packaged(video_id):
+        return None
+    if filename != INIT_FILE and filename not in {seg[2] for seg in load_segments(video_id)}:
+        return None
+    path = package_dir(video_id) / filename
+    return path if path.exists() else None
+
+
+def remux_clip(video_id: str, start_time: float, end_time: float, output_path: str) -> Optional[str]:
+    """
+    Build an MP4 clip from the covering segments with a stream copy (no re-encode):
+    init + media segments are concatenated into one fMP4, then remuxed so the
+    clip's timestamps start at zero.
+    """
+    segments = covering_segments(video_id, start_time, end_time)
+    if not segments:
+        return None
+
+    directory = package_dir(video_id)
+    with tempfile.NamedTemporaryFile(suffix=".mp4", dir=os.path.dirname(output_path), delete=False) as tmp:
+        for filename in [INIT_FILE] + [seg[2] for seg in segments]:
+            with open(directory / filename, "rb") as part:
+                shutil.copyfileobj(part, tmp)
+
+    # Write beside the target and rename, so a concurrent request never serves a partial clip
+    partial_path = f"{tmp.name}.part.mp4"
+    command = ["ffmpeg", "-y", "-i", tmp.name, "-c", "copy", "-movflags", "+faststart", partial_path]
+    try:
+        with FFMPEG_ACTIVE.track_inprogress():
+            subprocess.run(command, check=True, capture_output=True)
+        os.replace(partial_path, output_path)
+    finally:
+        os.unlink(tmp.name)
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    return output_path
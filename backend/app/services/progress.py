@@ -0,0 +1,119 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.config import (
+    INDEXING_TIMEOUT,
+    INDEXING_INITIAL_THROUGHPUT,
+    INDEXING_TIMEOUT_SAFETY_FACTOR,
+    INDEXING_MIN_TIMEOUT,
+    INDEXING_MAX_TIMEOUT,
+    PROGRESS_WRITE_INTERVAL_SECONDS
+)
+from app.db.models import IndexingProgress
+from app.db.engine import engine, DBClient
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ThroughputEstimator:
+    """
+    Moving average of indexing throughput in video seconds per second of pipeline
+    time (admission pauses excluded), used to size per-video timeouts from the
+    video's duration. The estimate is stored in the database, so the API and the
+    workers share one and it survives restarts; `throughput` is this process's last
+    read, used while the database can't be reached. Blocking: call off the event loop.
+    """
+    def __init__(self, initial: float = INDEXING_INITIAL_THROUGHPUT, smoothing: float = 0.3):
+        self.throughput = initial
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def current(self) -> float:
+        try:
+            with Session(engine) as session:
+                stored = DBClient(session).get_indexing_throughput()
+        except Exception as e:
+            logger.warning(f"Failed to read indexing throughput: {e}")
+            stored = None
+        if stored:
+            self.throughput = stored
+        return self.throughput
+
+    def record(self, duration_seconds: Optional[float], working_seconds: float):
+        if not duration_seconds or working_seconds <= 0:
+            return
+        observed = duration_seconds / working_seconds
+        with self._lock:
+            current = self.current()
+            self.throughput = current + self.smoothing * (observed - current)
+            try:
+                with Session(engine) as session:
+                    DBClient(session).save_indexing_throughput(self.throughput)
+            except Exception as e:
+                logger.warning(f"Failed to save indexing throughput: {e}")
+
+    def timeout_for(self, duration_seconds: Optional[float]) -> float:
+        """Budget of pipeline time for a video; admission pauses don't count against it."""
+        if not duration_seconds:
+            return INDEXING_TIMEOUT
+        expected = duration_seconds / self.current()
+        return min(max(expected * INDEXING_TIMEOUT_SAFETY_FACTOR, INDEXING_MIN_TIMEOUT), INDEXING_MAX_TIMEOUT)
+
+
+throughput_estimator = ThroughputEstimator()
+
+
+class ProgressTracker:
+    """
+    Tracks how far an indexing run got through the video. `update` is called per
+    persisted frame and returns a row to write only every `write_interval` seconds,
+    so the database sees a handful of writes per video rather than one per frame.
+    """
+    def __init__(self, video_id: str, owner_id: int, duration_seconds: Optional[float],
+                    write_interval: float = PROGRESS_WRITE_INTERVAL_SECONDS):
+        self.video_id = video_id
+        self.owner_id = owner_id
+        self.duration_seconds = duration_seconds
+        self.write_interval = write_interval
+        self.processed_seconds = 0.0
+        self.frames = 0
+        self.paused_seconds = 0.0  # spent waiting on admission control
+        self.started_at = time.monotonic()
+        self._written_at: Optional[float] = None
+
+    def pause(self, seconds: float):
+        self.paused_seconds += seconds
+
+    def working_seconds(self) -> float:
+        """Time since the run started, minus admission pauses."""
+        return max(time.monotonic() - self.started_at - self.paused_seconds, 0.0)
+
+    def update(self, timestamp: float) -> Optional[IndexingProgress]:
+        self.frames += 1
+        self.processed_seconds = max(self.processed_seconds, float(timestamp))
+        now = time.monotonic()
+        if self._written_at is not None and now - self._written_at < self.write_interval:
+            return None
+        self._written_at = now
+        return self.snapshot()
+
+    def snapshot(self) -> IndexingProgress:
+        elapsed = time.monotonic() - self.started_at
+        eta = None
+        if self.duration_seconds and self.processed_seconds > 0 and elapsed > 0:
+            remaining = max(self.duration_seconds - self.processed_seconds, 0.0)
+            eta = round(remaining * elapsed / self.processed_seconds, 1)
+        return IndexingProgress(
+            video_id=self.video_id,
+            owner_id=self.owner_id,
+            processed_seconds=round(self.processed_seconds, 2),
+            duration_seconds=self.duration_seconds,
+            frames=self.frames,
+            fps=round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+            eta_seconds=eta,
+            updated_at=datetime.utcnow()
+        )
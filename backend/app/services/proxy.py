@@ -0,0 +1,78 @@
+import json
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from app.config import PROXY_DIR, PROXY_MAX_SIZE, PROXY_FPS
+from .metrics import FFMPEG_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    """Container duration in seconds, or None if ffprobe can't tell."""
+    command = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", video_path]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except Exception as e:
+        logger.warning(f"Could not probe duration of {video_path}: {e}")
+        return None
+
+
+class ProxyVideo:
+    """
+    A small constant-frame-rate copy of an upload used as the indexing source. The
+    fps filter keeps the original timeline, so proxy timestamps map straight back.
+    No duration-based rescaling: the proxy's last frame sits up to one sampling
+    interval after the source's end, so a duration ratio would skew every timestamp.
+    """
+    def __init__(self, path: Path, fps: float):
+        self.path = path
+        self.fps = fps
+
+    def to_source_time(self, timestamp: float) -> float:
+        return round(float(timestamp), 3)
+
+
+def proxy_path(video_id: str) -> Path:
+    return PROXY_DIR / f"{video_id}.mp4"
+
+
+def make_proxy(video_path: str, video_id: str) -> ProxyVideo:
+    """
+    Transcode once to at most PROXY_MAX_SIZE pixels on the long side at PROXY_FPS.
+    Decoding the original at full resolution then happens a single time, inside
+    ffmpeg, instead of per frame in the inference loop.
+    """
+    target = proxy_path(video_id)
+    partial = target.with_suffix(".part.mp4")
+    size = PROXY_MAX_SIZE
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i", video_path,
+        "-an",
+        "-vf", (f"fps={PROXY_FPS},"
+                f"scale='min({size},iw)':'min({size},ih)':force_original_aspect_ratio=decrease,"
+                "scale=trunc(iw/2)*2:trunc(ih/2)*2"),
+        "-c:v", "libx264",
+        "-preset", "ultrafast",
+        "-crf", "23",
+        str(partial)
+    ]
+
+    logger.info(f"Creating {PROXY_FPS}fps indexing proxy for {video_id}")
+    try:
+        with FFMPEG_ACTIVE.track_inprogress():
+            subprocess.run(command, check=True, capture_output=True)
+        partial.replace(target)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    return ProxyVideo(target, PROXY_FPS)
+
+
+def delete_proxy(video_id: str):
+    proxy_path(video_id).unlink(missing_ok=True)
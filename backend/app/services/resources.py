@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from app.config import (
+    INDEXING_QUEUE_ENABLED,
+    QUERY_THREADS,
+    INDEXING_THREADS,
+    INDEXING_CPU_AFFINITY,
+    INDEXING_NICENESS,
+    SEARCH_P95_TARGET_MS,
+    ADMISSION_WINDOW_SECONDS,
+    ADMISSION_BACKOFF_SECONDS,
+    ADMISSION_MAX_PAUSE_SECONDS,
+    ADMISSION_PUBLISH_SECONDS
+)
+from .metrics import INDEXING_ADMISSION_PAUSE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """Parse a CPU list such as '0-3,6' into a set of CPU ids."""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def limit_threads(num_threads: int):
+    """
+    Cap intra-op thread pools for this process. Environment variables only affect
+    libraries loaded afterwards, so call this before loading models.
+    """
+    if num_threads <= 0:
+        return
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(num_threads)
+    try:
+        import cv2
+        cv2.setNumThreads(num_threads)
+    except ImportError:
+        pass
+    logger.info(f"Limited inference thread pools to {num_threads} threads")
+
+
+def apply_query_limits():
+    """Thread budget for processes serving search (API workers, encoder server)."""
+    limit_threads(QUERY_THREADS)
+
+
+def apply_indexing_limits():
+    """
+    Thread budget, CPU affinity and niceness for a dedicated indexing process, so
+    indexing yields cores to interactive search running elsewhere on the host.
+    Only the standalone worker calls this: every setting here is process-wide.
+    """
+    limit_threads(INDEXING_THREADS)
+    cpus = parse_cpu_list(INDEXING_CPU_AFFINITY)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+        logger.info(f"Pinned indexing to CPUs {sorted(cpus)}")
+    if INDEXING_NICENESS:
+        os.nice(INDEXING_NICENESS)
+        logger.info(f"Lowered indexing priority by {INDEXING_NICENESS}")
+
+
+def warn_unapplied_indexing_limits():
+    """In-process indexing runs under the API's limits; say so if indexing limits were configured."""
+    if not INDEXING_QUEUE_ENABLED and (INDEXING_THREADS or INDEXING_CPU_AFFINITY or INDEXING_NICENESS):
+        logger.warning("VANTAGE_INDEXING_THREADS/CPUS/NICENESS only apply to `python -m app.worker`; "
+                       "in-process indexing shares the query thread budget")
+
+
+class AdmissionController:
+    """
+    Protects interactive latency: search records its latencies, and indexing calls
+    `wait_for_capacity` between frames, backing off while the recent search p95 is
+    above target. Pauses are bounded so indexing can never starve completely.
+    Across processes (queue mode) the API publishes its p95 to the database with
+    `start_publishing` and workers read it back after `use_shared_latency`.
+    """
+    def __init__(self, target_ms: float = SEARCH_P95_TARGET_MS,
+                    window_seconds: float = ADMISSION_WINDOW_SECONDS):
+        self.target_ms = target_ms
+        self.window_seconds = window_seconds
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._shared = False
+        self._shared_p95: Optional[float] = None
+        self._shared_read_at = 0.0
+
+    def record_search(self, seconds: float):
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds * 1000))
+
+    def search_p95(self) -> Optional[float]:
+        local = self._local_p95()
+        if not self._shared:
+            return local
+        shared = self._read_shared_p95()
+        return max((p for p in (local, shared) if p is not None), default=None)
+
+    def _local_p95(self) -> Optional[float]:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            recent = sorted(ms for ts, ms in self._latencies if ts >= cutoff)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+
+    def start_publishing(self, interval: float = ADMISSION_PUBLISH_SECONDS):
+        """Publish this process's p95 for indexing workers in other processes."""
+        source = f"{socket.gethostname()}:{os.getpid()}"
+        threading.Thread(target=self._publish_loop, args=(source, interval),
+                            name="search-load-publisher", daemon=True).start()
+        logger.info(f"Publishing search latency as {source}")
+
+    def _publish_loop(self, source: str, interval: float):
+        from sqlmodel import Session
+        from app.db.engine import engine, DBClient
+
+        while True:
+            time.sleep(interval)
+            try:
+                with Session(engine) as session:
+                    DBClient(session).publish_search_load(
+                        source, self._local_p95(), datetime.utcnow() - timedelta(seconds=self.window_seconds))
+            except Exception as e:
+                logger.warning(f"Failed to publish search latency: {e}")
+
+    def use_shared_latency(self):
+        """Throttle on the p95 published by API processes rather than on local searches only."""
+        self._shared = True
+
+    def _read_shared_p95(self) -> Optional[float]:
+        now = time.monotonic()
+        if now - self._shared_read_at < ADMISSION_PUBLISH_SECONDS:
+            return self._shared_p95
+        from sqlmodel import Session
+        from app.db.engine import engine, DBClient
+
+        self._shared_read_at = now
+        try:
+            with Session(engine) as session:
+                since = datetime.utcnow() - timedelta(seconds=ADMISSION_PUBLISH_SECONDS * 3)
+                self._shared_p95 = DBClient(session).get_search_p95(since)
+        except Exception as e:
+            logger.warning(f"Failed to read shared search latency: {e}")
+        return self._shared_p95
+
+    def overloaded(self) -> bool:
+        p95 = self.search_p95()
+        return p95 is not None and p95 > self.target_ms
+
+    async def wait_for_capacity(self) -> float:
+        """Sleep while search is over its latency target; returns the seconds paused."""
+        if self.target_ms <= 0:
+            return 0.0
+        paused = 0.0
+        while paused < ADMISSION_MAX_PAUSE_SECONDS and self.overloaded():
+            await asyncio.sleep(ADMISSION_BACKOFF_SECONDS)
+            paused += ADMISSION_BACKOFF_SECONDS
+        if paused:
+            INDEXING_ADMISSION_PAUSE_SECONDS.inc(paused)
+            logger.info(f"Indexing paused {paused:.2f}s for search latency (p95 {self.search_p95()}ms)")
+        return paused
+
+
+admission_controller = AdmissionController()
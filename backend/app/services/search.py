@@ -1,11 +1,14 @@
 import os
+import time
 import logging
+import threading
 import numpy as np
 from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 
 from app.services.vector_store import VectorStore, SearchResults
-from app.services.structs import Moment, VideoMetadata
+from app.services.structs import Moment, VideoMetadata, SearchPage, SearchFilters
+from app.services.search_cache import CachedSearch, SearchCursorCache
 from app.config import (
     CLIPS_DIR, 
     CALIBRATION_FILE, 
@@ -13,11 +16,24 @@ from app.config import (
     CLUSTER_BUFFER_SECONDS, 
     CONFIDENCE_THRESHOLD,
     STOP_WORDS,
-    SIGLIP2_MODEL_ID
+    SIGLIP2_MODEL_ID,
+    SEARCH_INITIAL_CANDIDATE_MULTIPLIER,
+    SEARCH_CANDIDATE_GROWTH_FACTOR,
+    SEARCH_MAX_CANDIDATES,
+    SIMILAR_FRAME_THRESHOLD,
+    ENCODER_SOCKET_PATH
 )
-from vision_tools.core.tools.embedder import OVSigLIP2Embedder
+from .encoder_server import EncoderClient
+from .vocabulary import ClassVocabulary
+from .metrics import SEARCH_STAGE_SECONDS
+from .tracing import traced_stage, note_append
+from .resources import admission_controller
+from .packaging import is_packaged, clip_bounds
 from .utils import cut_video_clip
 
+if TYPE_CHECKING:
+    from vision_tools.core.tools.embedder import OVSigLIP2Embedder
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,61 +42,227 @@ class SearchService:
     def __init__(self, vector_store: VectorStore, device: str = "cpu"):
         self.vector_store = vector_store
         self.device = device
-        self.embedder = self._load_embedder()
+        self.encoder_client = EncoderClient() if ENCODER_SOCKET_PATH else None
+        self._embedder_lock = threading.Lock()
+        self.embedder = None if self.encoder_client else self._load_embedder()
+        self.cursor_cache = SearchCursorCache()
+        self.vocabulary = ClassVocabulary(self._encode_texts)
+
+    def _load_embedder(self) -> "OVSigLIP2Embedder":
+        from vision_tools.core.tools.embedder import OVSigLIP2Embedder
 
-    def _load_embedder(self) -> OVSigLIP2Embedder:
         emebdder = OVSigLIP2Embedder(model_id=SIGLIP2_MODEL_ID,
                                         config={}, device=self.device)
         emebdder.load_tool({})
         logger.info("OVSigLIP2Embedder initialized for search")
         return emebdder
 
+    def _local_embedder(self) -> "OVSigLIP2Embedder":
+        """The in-process model, loaded once even when many requests fall back at the same moment."""
+        if self.embedder is None:
+            with self._embedder_lock:
+                if self.embedder is None:
+                    self.embedder = self._load_embedder()
+        return self.embedder
+
+    def warm_up(self):
+        """Run a throwaway encode and query to warm the model kernels and HNSW pages."""
+        query_vector = self._encode_text("warm up")
+        self.vocabulary.load(wait=True)
+        if self.vector_store.count() > 0:
+            self.vector_store.search_embeddings(query_vector, n_results=1)
+        logger.info("SearchService warm-up complete")
+
+    def _encode_text(self, text: str) -> List[float]:
+        """Encode through the shared encoder server if configured, else locally."""
+        with traced_stage("encode_text", SEARCH_STAGE_SECONDS):
+            if self.encoder_client:
+                try:
+                    return self.encoder_client.encode_text(text)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Encoder server unavailable, falling back to local model: {e}")
+
+            return self._local_embedder().encode_text(text)
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Bulk encode outside request tracing and the search-stage histogram (vocabulary builds)."""
+        if self.encoder_client:
+            try:
+                return np.asarray(self.encoder_client.encode_texts(texts), dtype=np.float32)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Encoder server unavailable, falling back to local model: {e}")
+
+        embedder = self._local_embedder()
+        return np.asarray([embedder.encode_text(text) for text in texts], dtype=np.float32)
+
     def search_videos(self, query: str, owner_id: int, limit: int = 5) -> List[Moment]:
         """
         Search for videos utilizing both vector similarity and explicit tag matching.
         """
-        vector_results = self._vector_search(query, owner_id, limit)
-        tag_results = self._tag_search(query, owner_id, limit)
-        
-        merged_results = self._merge_and_rank_results(vector_results, tag_results)
-        
-        moments = self._cluster_moments(merged_results, CLUSTER_BUFFER_SECONDS)
+        return self.search_page(query, owner_id, limit).results
+
+    def search_page(self, query: str, owner_id: int, limit: int = 10,
+                        cursor: Optional[str] = None,
+                        filters: Optional[SearchFilters] = None) -> SearchPage:
+        """
+        Return one page of ranked moments. The first call encodes the query and caches
+        the ranked list server-side; following pages are sliced from the cache through
+        `next_cursor`, extending the candidate pool only when the cursor runs past it.
+        `filters` are pushed down into the vector store and kept with the cursor.
+        """
+        start = time.perf_counter()
+        if cursor:
+            key, entry, offset = self.cursor_cache.resolve(cursor, owner_id)
+        else:
+            query_vector = self._encode_text(query)
+            entry = CachedSearch(query, owner_id, query_vector,
+                                    where=filters.to_where(owner_id) if filters else None)
+            key, offset = None, 0
+
+        page = self._serve_page(entry, key, offset, limit)
+        admission_controller.record_search(time.perf_counter() - start)
+        return page
+
+    def search_similar(self, frame_id: str, owner_id: int, limit: int = 10,
+                            filters: Optional[SearchFilters] = None) -> SearchPage:
+        """
+        Query-by-example: search with the stored embedding of an indexed frame instead of
+        encoding text. The moment the source frame belongs to is left out of the results.
+        """
+        start = time.perf_counter()
+        stored = self.vector_store.get_embedding(frame_id)
+        if stored is None or stored[1].get("owner_id") != owner_id:
+            raise LookupError(f"Frame {frame_id} not found")
+
+        embedding, metadata = stored
+        entry = CachedSearch("", owner_id, embedding, calibrated=False,
+                                exclude=(metadata["video_id"], metadata["timestamp"]),
+                                where=filters.to_where(owner_id) if filters else None)
+
+        page = self._serve_page(entry, None, 0, limit)
+        admission_controller.record_search(time.perf_counter() - start)
+        return page
+
+    def _serve_page(self, entry: CachedSearch, key: Optional[str],
+                        offset: int, limit: int) -> SearchPage:
+
+        rounds = 0
+        # Concurrent pages of one cursor must not interleave deepening rounds and the served count
+        with entry.lock:
+            while offset + limit > len(entry.moments) and not entry.exhausted:
+                self._extend_candidates(entry, limit)
+                rounds += 1
+
+            page = entry.moments[offset:offset + limit]
+            next_offset = offset + len(page)
+            entry.served = max(entry.served, next_offset)
+            has_more = next_offset < len(entry.moments) or not entry.exhausted
+
+        if rounds:
+            logger.info(f"Search deepened in {rounds} round(s) to {entry.candidate_limit} candidates "
+                            f"({len(entry.moments)} moments, exhausted={entry.exhausted})")
+
+        for moment in page:
+            self._attach_clip(moment)
+
+        next_cursor = None
+        if has_more:
+            if key is None:
+                key = self.cursor_cache.put(entry)
+            next_cursor = self.cursor_cache.encode(key, next_offset)
+
+        return SearchPage(results=page, next_cursor=next_cursor)
+
+    def _extend_candidates(self, entry: CachedSearch, limit: int):
+        """
+        One round of iterative deepening: start from a small candidate pool and grow it
+        geometrically. A source stops being queried once it cannot yield more matches -
+        fewer results than asked for, or (vector results being sorted by distance) the
+        weakest result already falls below the confidence threshold.
+        Moments already handed out keep their positions so earlier cursors stay
+        consistent; only the tail is replaced.
+        """
+        candidate_limit = min(max(entry.candidate_limit * SEARCH_CANDIDATE_GROWTH_FACTOR,
+                                    limit * SEARCH_INITIAL_CANDIDATE_MULTIPLIER),
+                                SEARCH_MAX_CANDIDATES)
+        threshold = CONFIDENCE_THRESHOLD if entry.calibrated else SIMILAR_FRAME_THRESHOLD
+
+        if not entry.vector_exhausted:
+            with traced_stage("vector_query", SEARCH_STAGE_SECONDS):
+                entry.vector_results = self._vector_search(entry.query_vector, entry.where,
+                                                            candidate_limit, calibrated=entry.calibrated)
+            similarities = entry.vector_results.similarities
+            entry.vector_exhausted = (len(similarities) < candidate_limit
+                                        or (len(similarities) > 0 and similarities[-1] < threshold))
+
+        if not entry.tag_exhausted:
+            with traced_stage("tag_query", SEARCH_STAGE_SECONDS):
+                entry.tag_results = self._tag_search(entry.query, entry.where, candidate_limit,
+                                                        query_vector=entry.query_vector if entry.calibrated else None)
+            # Tags are matched over a bounded scan; only a short scan proves there is no more
+            entry.tag_exhausted = entry.tag_results.exhausted
+
+        with traced_stage("merge", SEARCH_STAGE_SECONDS):
+            merged_results = self._merge_and_rank_results(entry.vector_results, entry.tag_results, threshold)
+
+        with traced_stage("cluster", SEARCH_STAGE_SECONDS):
+            moments = self._cluster_moments(merged_results, CLUSTER_BUFFER_SECONDS)
+        if entry.exclude:
+            moments = [m for m in moments if not self._contains(m, *entry.exclude)]
+
+        note_append("rounds", {
+            "candidate_limit": candidate_limit,
+            "vector_candidates": len(entry.vector_results.ids),
+            "tag_candidates": len(entry.tag_results.ids),
+            "threshold_drops": sum(1 for sim in entry.vector_results.similarities if sim < threshold),
+            "clusters": len(moments)
+        })
         moments.sort(key=lambda x: x.confidence, reverse=True)
-        
-        return moments[:limit]
 
-    def _vector_search(self, query: str, owner_id: int, limit: int) -> SearchResults:
-        
-        query_vector = self.embedder.encode_text(query)
-        where_filter = {"owner_id": owner_id}
-        candidate_limit = limit * 10        
+        # Clusters grow as the pool deepens, so a moment id is not stable across rounds:
+        # drop any new moment overlapping one already served rather than matching ids
+        served = entry.moments[:entry.served]
+        entry.moments = served + [m for m in moments
+                                    if not any(self._overlaps(m, s) for s in served)]
+
+        entry.exhausted = ((entry.vector_exhausted and entry.tag_exhausted)
+                            or candidate_limit >= SEARCH_MAX_CANDIDATES)
+        entry.candidate_limit = candidate_limit
+
+    def _vector_search(self, query_vector: List[float], where: Dict[str, Any],
+                            candidate_limit: int, calibrated: bool = True) -> SearchResults:
         
         try:
             search_results = self.vector_store.search_embeddings(query_vector, 
                                                                  n_results=candidate_limit,
-                                                                 where=where_filter)
+                                                                 where=where,
+                                                                 calibrated=calibrated)
         except Exception as e:
             logger.warning(f"Vector search failed: {e}")
             return SearchResults(ids=[], metadatas=[], similarities=[])
 
         return search_results
 
-    def _tag_search(self, query: str, owner_id: int, limit: int) -> SearchResults:
+    def _tag_search(self, query: str, where: Dict[str, Any], candidate_limit: int,
+                        query_vector: Optional[List[float]] = None) -> SearchResults:
 
-        query_words = [w.lower() for w in query.split()]
-        significant_words = [w for w in query_words if w 
-                                not in STOP_WORDS and len(w) > 2]
+        if self.vocabulary.load():
+            # Embeds the query's unseen words and phrases, so it's timed on its own
+            with traced_stage("vocabulary_match", SEARCH_STAGE_SECONDS):
+                tags = self.vocabulary.match(query, query_vector)
+        else:
+            # No detector vocabulary saved (or embedded) yet: fall back to the query's keywords
+            query_words = [w.lower() for w in query.split()]
+            tags = [w for w in query_words if w not in STOP_WORDS and len(w) > 2]
         
-        logger.info(f"Tag Search: Query='{query}' -> Keywords={significant_words}")
+        logger.info(f"Tag Search: Query='{query}' -> Classes={tags}")
         
-        if not significant_words:
+        if not tags:
             return SearchResults(ids=[], metadatas=[], similarities=[])
-            
-        candidate_limit = limit * 10
 
         try:
-            search_results = self.vector_store.search_by_tags(significant_words, 
-                                                    owner_id=owner_id, 
+            search_results = self.vector_store.search_by_tags(tags, 
+                                                    where=where, 
                                                     limit=candidate_limit)
         except Exception as e:
             logger.error(f"Tag search failed: {e}")
@@ -89,15 +271,16 @@ class SearchService:
         return search_results
 
     def _merge_and_rank_results(self, vector_results: SearchResults, 
-                                    tag_results: SearchResults) -> Dict[str, Dict]:
+                                    tag_results: SearchResults,
+                                    threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, Dict]:
      
         merged_results = defaultdict(list)
 
         confidences = np.array(vector_results.similarities)
-        relevant_results_indices = np.where(confidences >= CONFIDENCE_THRESHOLD)[0]
+        relevant_results_indices = np.where(confidences >= threshold)[0]
 
         for idx in relevant_results_indices:
-            metadata = vector_results.metadatas[idx]
+            metadata = {**vector_results.metadatas[idx], "frame_id": vector_results.ids[idx]}
             video_id = metadata['video_id']
                 
             merged_results[video_id].append({
@@ -114,7 +297,7 @@ class SearchService:
             merged_results[video_id].append({
                 "timestamp": meta['timestamp'],
                 "confidence": round(tag_results.similarities[i] * 100, 2),
-                "metadata": meta,
+                "metadata": {**meta, "frame_id": tag_results.ids[i]},
                 "source": "tag"
             })
                 
@@ -146,22 +329,12 @@ class SearchService:
     def _create_moment(video_id: str, matches: List[Dict]) -> Moment:
         """Process a group of frame matches into a single 'moment' result."""
         best_match = max(matches, key=lambda x: x['confidence'])
-        video_path = best_match['metadata'].get('video_path')
             
         start_time = max(0, min(m['timestamp'] for m in matches) - TIME_PADDING_SECONDS)
         end_time = max(m['timestamp'] for m in matches) + TIME_PADDING_SECONDS
         
         clip_id = f"{video_id}_{int(start_time)}_{int(end_time)}"
         
-        clip_path = None
-        if video_path and os.path.exists(video_path):
-            try:
-                clip_path = cut_video_clip(CLIPS_DIR, video_path, start_time, end_time, clip_id)
-            except Exception as e:
-                logger.error(f"Failed to cut clip: {e}")
-        else:
-            logger.warning(f"Video path missing or invalid: {video_path}")
-        
         metadata = best_match['metadata'].copy()
         metadata.update({
             "start_time": start_time,
@@ -169,7 +342,7 @@ class SearchService:
             "clip_duration": end_time - start_time,
             "match_count": len(matches),
             "clip_id": clip_id,
-            "clip_path": clip_path
+            "clip_path": None
         })
         
         return Moment(
@@ -178,5 +351,63 @@ class SearchService:
             metadata=VideoMetadata(**metadata),
             match_type=best_match['source'],
             type="clip",
-            clip_url=f"/api/clips/{clip_id}" if clip_path else None
+            clip_url=None
         )
+
+    @staticmethod
+    def _attach_segment_clip(moment: Moment):
+        """
+        Packaged videos serve clips as ranges of ingest-time segments: no encoding happens
+        here, and the moment's bounds snap to the segments that will actually be played.
+        """
+        start_time, end_time = int(moment.metadata.start_time), int(moment.metadata.end_time)
+        bounds = clip_bounds(moment.metadata.video_id, start_time, end_time)
+        if bounds is None:
+            logger.warning(f"No segments cover {moment.id}")
+            return
+
+        moment.metadata.start_time, moment.metadata.end_time = bounds
+        moment.metadata.clip_duration = bounds[1] - bounds[0]
+        moment.clip_url = f"/api/clips/{moment.id}"
+        moment.playlist_url = f"/api/clips/{moment.id}/playlist.m3u8"
+
+    @staticmethod
+    def _contains(moment: Moment, video_id: str, timestamp: float) -> bool:
+        return (moment.metadata.video_id == video_id
+                    and moment.metadata.start_time <= timestamp <= moment.metadata.end_time)
+
+    @staticmethod
+    def _overlaps(moment: Moment, other: Moment) -> bool:
+        return (moment.metadata.video_id == other.metadata.video_id
+                    and moment.metadata.start_time <= other.metadata.end_time
+                    and other.metadata.start_time <= moment.metadata.end_time)
+
+    @staticmethod
+    def _attach_clip(moment: Moment):
+        """Cut the clip for a moment that is about to be served."""
+        if moment.clip_url:
+            return
+
+        if is_packaged(moment.metadata.video_id):
+            SearchService._attach_segment_clip(moment)
+            return
+
+        video_path = moment.metadata.video_path
+        if not video_path or not os.path.exists(video_path):
+            logger.warning(f"Video path missing or invalid: {video_path}")
+            return
+
+        start = time.perf_counter()
+        try:
+            with traced_stage("clip_cut", SEARCH_STAGE_SECONDS):
+                clip_path = cut_video_clip(CLIPS_DIR, video_path, moment.metadata.start_time,
+                                            moment.metadata.end_time, moment.id)
+        except Exception as e:
+            logger.error(f"Failed to cut clip: {e}")
+            return
+
+        note_append("clips", {"clip_id": moment.id,
+                              "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+        moment.metadata.clip_path = clip_path
+        moment.clip_url = f"/api/clips/{moment.id}"
@@ -0,0 +1,129 @@
+import time
+import uuid
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.structs import Moment
+from app.services.vector_store import SearchResults
+from app.config import SEARCH_CURSOR_TTL_SECONDS, SEARCH_CURSOR_MAX_ENTRIES, SEARCH_CURSOR_MAX_RESULTS
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSearch:
+    """
+    Server-side state behind a search cursor: the encoded query and the
+    fully ranked moment list built from the current candidate pool.
+    `exclude` is an optional (video_id, timestamp) whose moment is dropped, and
+    `where` the vector store filter every round runs with. Hold `lock` while
+    deepening or paging, since concurrent requests may resolve the same cursor.
+    """
+    def __init__(self, query: str, owner_id: int, query_vector: List[float],
+                    calibrated: bool = True, exclude: Optional[Tuple[str, float]] = None,
+                    where: Optional[Dict[str, Any]] = None):
+        self.query = query
+        self.owner_id = owner_id
+        self.where = where or {"owner_id": owner_id}
+        self.query_vector = query_vector
+        self.calibrated = calibrated
+        self.exclude = exclude
+        self.moments: List[Moment] = []
+        self.vector_results: Optional[SearchResults] = None
+        self.tag_results: Optional[SearchResults] = None
+        self.vector_exhausted = False
+        self.tag_exhausted = False
+        self.candidate_limit = 0
+        self.exhausted = False
+        self.served = 0
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def size(self) -> int:
+        """Approximate footprint, in results held (candidates plus ranked moments)."""
+        held = len(self.moments)
+        for results in (self.vector_results, self.tag_results):
+            if results is not None:
+                held += len(results.ids)
+        return held
+
+
+class SearchCursorCache:
+    """
+    In-memory LRU of ranked search results, addressed by opaque cursors.
+    Entries expire `ttl_seconds` after their last use and the oldest are evicted once
+    `max_entries` is reached or they together hold more than `max_results` results.
+    Entries grow after insertion, so the size cap is re-checked on every access.
+    """
+    def __init__(self, ttl_seconds: float = SEARCH_CURSOR_TTL_SECONDS,
+                        max_entries: int = SEARCH_CURSOR_MAX_ENTRIES,
+                        max_results: int = SEARCH_CURSOR_MAX_RESULTS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_results = max_results
+        self._entries: "OrderedDict[str, CachedSearch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, entry: CachedSearch) -> str:
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._evict_expired()
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._evict_oversize()
+        return key
+
+    def resolve(self, cursor: str, owner_id: int) -> Tuple[str, CachedSearch, int]:
+        """
+        Decode a cursor into its cache key, entry and offset.
+        Raises ValueError if the cursor is malformed, expired or foreign.
+        """
+        key, offset = self._decode(cursor)
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(key)
+            if entry is None or entry.owner_id != owner_id:
+                raise ValueError("Invalid or expired search cursor")
+            entry.touched_at = time.monotonic()
+            self._entries.move_to_end(key)
+            self._evict_oversize()
+        return key, entry, offset
+
+    @staticmethod
+    def encode(key: str, offset: int) -> str:
+        raw = f"{key}:{offset}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode(cursor: str) -> Tuple[str, int]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            key, offset = base64.urlsafe_b64decode(padded).decode().split(":")
+            offset = int(offset)
+        except Exception:
+            raise ValueError("Invalid or expired search cursor")
+        if offset < 0:
+            raise ValueError("Invalid or expired search cursor")
+        return key, offset
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if now - e.touched_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            logger.debug(f"Evicted {len(expired)} expired search cursors")
+
+    def _evict_oversize(self):
+        """Drop least recently used entries until the held results fit; the newest always stays."""
+        total = sum(e.size() for e in self._entries.values())
+        evicted = 0
+        while total > self.max_results and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size()
+            evicted += 1
+        if evicted:
+            logger.debug(f"Evicted {evicted} search cursors over the size cap")
@@ -1,8 +1,13 @@
+from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
+from app.config import DETECTION_THRESHOLD
+from .detections import class_field, stored_threshold
+
 class VideoMetadata(BaseModel):
     video_id: str
+    frame_id: Optional[str] = None
     owner_id: Optional[int] = None
     timestamp: float
     video_path: Optional[str] = None
@@ -21,3 +26,32 @@ class Moment(BaseModel):
     match_type: str = Field(default="unknown") # 'vector' or 'tag'
     type: str = Field(default="clip")
     clip_url: Optional[str] = None
+    playlist_url: Optional[str] = None # HLS playlist when the video is packaged
+
+def _epoch(value: datetime) -> float:
+    # Naive datetimes are UTC, like the Video timestamps
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+class SearchFilters(BaseModel):
+    """Constraints compiled into the vector store's `where` clause, so only matching frames are scanned."""
+    video_ids: Optional[List[str]] = None
+    classes: Optional[List[str]] = None # every listed class must be detected in the frame
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def to_where(self, owner_id: int) -> Dict[str, Any]:
+        clauses: List[Dict[str, Any]] = [{"owner_id": owner_id}]
+        if self.video_ids:
+            clauses.append({"video_id": {"$in": list(self.video_ids)}})
+        for name in self.classes or []:
+            clauses.append({class_field(name): {"$gte": stored_threshold(DETECTION_THRESHOLD)}})
+        if self.created_after:
+            clauses.append({"created_at": {"$gte": _epoch(self.created_after)}})
+        if self.created_before:
+            clauses.append({"created_at": {"$lt": _epoch(self.created_before)}})
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+class SearchPage(BaseModel):
+    results: List[Moment]
+    next_cursor: Optional[str] = None
+    trace: Optional[Dict[str, Any]] = None # only with profile=1
@@ -0,0 +1,100 @@
+import json
+import shutil
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+
+from app.config import THUMBNAILS_DIR, THUMBNAIL_WIDTH, SPRITE_COLUMNS, SPRITE_MAX_TILES, SPRITE_QUALITY
+
+logger = logging.getLogger(__name__)
+
+SPRITE_FILE = "sprite.jpg"
+INDEX_FILE = "index.json"
+
+
+class SpriteBuilder:
+    """
+    Collects downscaled copies of the frames indexing already decodes and packs them
+    into one JPEG sprite sheet per video, with a JSON index of tile offsets.
+    Tiles are thinned as they arrive - every `step`-th frame is kept, and the step
+    doubles whenever `max_tiles` is reached - so memory stays bounded on long videos.
+    """
+    def __init__(self, video_id: str, tile_width: int = THUMBNAIL_WIDTH,
+                    max_tiles: int = SPRITE_MAX_TILES):
+        self.video_id = video_id
+        self.tile_width = tile_width
+        self.tile_height: Optional[int] = None
+        self.max_tiles = max_tiles
+        self.tiles: List[Tuple[float, np.ndarray]] = []
+        self.step = 1
+        self._seen = 0
+
+    def add(self, timestamp: float, frame: np.ndarray):
+        import cv2
+
+        keep = self._seen % self.step == 0
+        self._seen += 1
+        if not keep:
+            return
+
+        height, width = frame.shape[:2]
+        if self.tile_height is None:
+            self.tile_height = max(1, round(height * self.tile_width / width))
+        tile = cv2.resize(frame, (self.tile_width, self.tile_height), interpolation=cv2.INTER_AREA)
+        self.tiles.append((timestamp, tile))
+
+        if len(self.tiles) >= self.max_tiles:
+            # Kept tiles are the multiples of `step`; every other one is a multiple of 2*step
+            self.tiles = self.tiles[::2]
+            self.step *= 2
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def write(self) -> Optional[Path]:
+        import cv2
+
+        if not self.tiles:
+            return None
+
+        tiles = sorted(self.tiles, key=lambda t: t[0])
+
+        columns = min(SPRITE_COLUMNS, len(tiles))
+        rows = (len(tiles) + columns - 1) // columns
+        sheet = np.zeros((rows * self.tile_height, columns * self.tile_width, 3), dtype=np.uint8)
+
+        index = []
+        for i, (timestamp, tile) in enumerate(tiles):
+            x, y = (i % columns) * self.tile_width, (i // columns) * self.tile_height
+            sheet[y:y + self.tile_height, x:x + self.tile_width] = tile
+            index.append({"t": round(float(timestamp), 3), "x": x, "y": y})
+
+        ok, encoded = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, SPRITE_QUALITY])
+        if not ok:
+            raise RuntimeError(f"Failed to encode sprite sheet for {self.video_id}")
+
+        target = thumbnails_dir(self.video_id)
+        target.mkdir(parents=True, exist_ok=True)
+        (target / SPRITE_FILE).write_bytes(encoded.tobytes())
+        with open(target / INDEX_FILE, "w") as f:
+            json.dump({"tile_width": self.tile_width, "tile_height": self.tile_height,
+                       "columns": columns, "tiles": index}, f)
+
+        logger.info(f"Wrote sprite sheet for {self.video_id} ({len(tiles)} tiles)")
+        return target
+
+
+def thumbnails_dir(video_id: str) -> Path:
+    return THUMBNAILS_DIR / video_id
+
+
+def thumbnail_file(video_id: str, filename: str) -> Optional[Path]:
+    if filename not in (SPRITE_FILE, INDEX_FILE):
+        return None
+    path = thumbnails_dir(video_id) / filename
+    return path if path.exists() else None
+
+
+def delete_thumbnails(video_id: str):
+    shutil.rmtree(thumbnails_dir(video_id), ignore_errors=True)
@@ -0,0 +1,90 @@
+import time
+import cProfile
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """
+    Per-request stage timings (always collected, rendered as Server-Timing) plus
+    optional diagnostic details gathered when `detailed` is set.
+    """
+    def __init__(self, detailed: bool = False):
+        self.detailed = detailed
+        self.stages: "OrderedDict[str, float]" = OrderedDict()
+        self.details: Dict[str, Any] = {}
+        self.started_at = time.perf_counter()
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started_at
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            **self.details
+        }
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(detailed: bool = False, profile_path: Optional[Path] = None):
+    """
+    Collect a trace for the enclosed work. With `profile_path`, the work also runs
+    under cProfile and the stats are dumped there.
+    """
+    trace = RequestTrace(detailed=detailed)
+    token = _current_trace.set(trace)
+    profiler = cProfile.Profile() if profile_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield trace
+    finally:
+        if profiler:
+            profiler.disable()
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(profile_path))
+            trace.details["cprofile_path"] = str(profile_path)
+            logger.info(f"cProfile stats written to {profile_path}")
+        _current_trace.reset(token)
+
+
+@contextmanager
+def traced_stage(name: str, histogram=None):
+    """
+    Time a stage into the current trace, and into `histogram` (labelled by stage) if given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(elapsed, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+
+
+def note_append(key: str, value: Any):
+    """Append a diagnostic detail to a list on the current trace, when a detailed trace is active."""
+    trace = _current_trace.get()
+    if trace is not None and trace.detailed:
+        trace.details.setdefault(key, []).append(value)
@@ -4,6 +4,8 @@ import logging
 import traceback
 import json
 
+from .metrics import CLIP_CACHE_REQUESTS, FFMPEG_ACTIVE
+
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +18,9 @@ def cut_video_clip(clips_dir: str, video_path: str, start_time: float, end_time:
     output_path = os.path.join(clips_dir, output_filename)
     
     if os.path.exists(output_path):
+        CLIP_CACHE_REQUESTS.inc(result="hit")
         return output_path
+    CLIP_CACHE_REQUESTS.inc(result="miss")
         
     duration = end_time - start_time
     
@@ -37,7 +41,8 @@ def cut_video_clip(clips_dir: str, video_path: str, start_time: float, end_time:
     ]
     
     logger.info(f"Cutting clip {clip_id} from {video_path} at {start_time} (duration {duration})")
-    subprocess.run(command, check=True, capture_output=True)
+    with FFMPEG_ACTIVE.track_inprogress():
+        subprocess.run(command, check=True, capture_output=True)
     
     return output_path
 
@@ -61,3 +66,12 @@ def _get_calibration_params(calibration_file) -> tuple:
         raise
 
     return calibration_params
+
+
+def _get_vocabulary_threshold(calibration_file, default: float) -> float:
+    """Calibrated phrase-to-class-name threshold, or `default` if the vocabulary hasn't been calibrated."""
+    try:
+        with open(calibration_file, 'r') as f:
+            return float(json.load(f)["vocabulary"]["recommended_threshold"])
+    except (OSError, KeyError, TypeError, ValueError):
+        return default
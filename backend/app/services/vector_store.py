@@ -1,13 +1,18 @@
-import json
 import uuid
 import logging
 from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-import chromadb
-from chromadb.config import Settings
-from app.config import CALIBRATION_FILE
+from app.config import (
+    CALIBRATION_FILE,
+    VECTOR_BATCH_SIZE,
+    HNSW_SPACE,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_SEARCH_EF,
+    HNSW_M
+)
 from .utils import _get_calibration_params
+from .detections import frame_classes
 
 
 logger = logging.getLogger(__name__)
@@ -15,24 +20,38 @@ logger = logging.getLogger(__name__)
 
 class SearchResults:
     def __init__(self, ids: List[str], metadatas: List[Dict[str, Any]],
-                         similarities: List[float]):
+                         similarities: List[float], exhausted: bool = True):
         self.ids = ids
         self.metadatas = metadatas
         self.similarities = similarities
+        # False when a scan stopped at its limit, so a larger limit may find more
+        self.exhausted = exhausted
 
 
 class VectorStore:
     """
     Abstraction layer for ChromaDB to store and retrieve video frame embeddings.
     """
-    def __init__(self, collection_name: str = "video_frames", persist_dir: str = "chroma_db"):
+    def __init__(self, collection_name: str = "video_frames", persist_dir: str = "chroma_db",
+                    hnsw_params: Optional[Dict[str, Any]] = None,
+                    host: Optional[str] = None, port: int = 8000):
+        import chromadb
+        from chromadb.config import Settings
+
         self.calibration_params = _get_calibration_params(CALIBRATION_FILE)
-        self.client = chromadb.PersistentClient(path=persist_dir, settings=Settings(allow_reset=True))
+        self.hnsw_params = {**self.hnsw_metadata(), **(hnsw_params or {})}
+        if host:
+            # A Chroma server lets several processes (API, indexing workers) share one index
+            self.client = chromadb.HttpClient(host=host, port=port, settings=Settings(allow_reset=True))
+            location = f"http://{host}:{port}"
+        else:
+            self.client = chromadb.PersistentClient(path=persist_dir, settings=Settings(allow_reset=True))
+            location = persist_dir
         self.collection = self.client.get_or_create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self.hnsw_params
         )
-        logger.info(f"VectorStore initialized with collection '{collection_name}' using cosine similarity at '{persist_dir}'")
+        logger.info(f"VectorStore initialized with collection '{collection_name}' using {HNSW_SPACE} similarity at '{location}'")
 
     def add_embedding(self, embedding: List[float], metadata: Dict[str, Any], id: Optional[str] = None):
         """
@@ -47,22 +66,65 @@ class VectorStore:
             ids=[id]
         )
 
+    def add_embeddings(self, ids: List[str], embeddings, metadatas: List[Dict[str, Any]],
+                            batch_size: int = VECTOR_BATCH_SIZE):
+        """
+        Bulk-adds embeddings in batches (used to rebuild from manifests/snapshots).
+        """
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.add(
+                embeddings=[list(map(float, e)) for e in embeddings[start:end]],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+
+    def export_all(self, batch_size: int = VECTOR_BATCH_SIZE) -> Tuple[List[str], List, List[Dict[str, Any]]]:
+        """
+        Reads every record (ids, embeddings, metadatas) from the collection in pages.
+        """
+        ids, embeddings, metadatas = [], [], []
+        offset = 0
+        while True:
+            page = self.collection.get(include=["embeddings", "metadatas"],
+                                        limit=batch_size, offset=offset)
+            if not page['ids']:
+                break
+            ids.extend(page['ids'])
+            embeddings.extend(page['embeddings'])
+            metadatas.extend(page['metadatas'])
+            offset += len(page['ids'])
+        return ids, embeddings, metadatas
+
     def search_embeddings(self, query_embedding: List[float], n_results: int = 5,
-                                     where: Optional[Dict] = None) -> SearchResults:
+                                     where: Optional[Dict] = None,
+                                     calibrated: bool = True) -> SearchResults:
         """
         Searches for the nearest neighbors of the query embedding.
+        Text-to-image calibration is skipped for image queries (calibrated=False),
+        in which case raw cosine similarities are returned.
         """
         raw_results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
             where=where
         )
-        return self.collate(raw_results)
+        return self.collate(raw_results, calibrated=calibrated)
 
-    def search_by_tags(self, tags: List[str], owner_id: int,
+    def get_embedding(self, id: str) -> Optional[Tuple[List[float], Dict[str, Any]]]:
+        """
+        Fetches a stored embedding and its metadata by id, or None if missing.
+        """
+        raw = self.collection.get(ids=[id], include=["embeddings", "metadatas"])
+        if not raw['ids']:
+            return None
+        return list(raw['embeddings'][0]), raw['metadatas'][0]
+
+    def search_by_tags(self, tags: List[str], where: Dict[str, Any],
                          limit: int = 10) -> SearchResults:
         """
-        Search for records where 'detected_classes' metadata contains any of the provided tags.
+        Search for records matching `where` (at least the owner) where any of the provided
+        tags is one of the detected class names (case-insensitive, whole names only).
         """
         if not tags:
             return SearchResults(ids=[], metadatas=[], similarities=[])
@@ -70,7 +132,7 @@ class VectorStore:
         search_limit = limit * 10
         
         broad_results = self.collection.get(
-            where={"owner_id": owner_id},
+            where=where,
             limit=search_limit,
             include=["metadatas"]
         )
@@ -81,7 +143,9 @@ class VectorStore:
         
         return SearchResults(ids=filtered_results['ids'], 
                                 metadatas=filtered_results['metadatas'], 
-                                similarities=filtered_results['similarities'])
+                                similarities=filtered_results['similarities'],
+                                exhausted=(len(broad_results['ids']) < search_limit
+                                            and len(filtered_results['ids']) < limit))
 
     def _filter_by_tag(self, candidates: Dict[str, Dict], tags: List[str], limit: int) -> Dict[str, List]:
             
@@ -90,16 +154,17 @@ class VectorStore:
         filtered_results = defaultdict(list)                        
         for i, meta in enumerate(candidates['metadatas']):
         
-            classes_str = meta.get('detected_classes', '').lower()
-            if not classes_str:
+            # Detection thresholds are applied here, at query time
+            class_confidence_mapping = frame_classes(meta)
+            if not class_confidence_mapping:
                 continue
 
-            class_confidence_mapping = json.loads(meta['class_confidences'])
-            matched_tags = [tag for tag in normalized_tags if tag in classes_str]
+            class_confidences = {name.lower(): conf for name, conf in class_confidence_mapping.items()}
+            matched_tags = [tag for tag in normalized_tags if tag in class_confidences]
             if not matched_tags:
                 continue
 
-            max_conf = max(class_confidence_mapping.get(tag, 0.0) for tag in matched_tags)
+            max_conf = max(class_confidences[tag] for tag in matched_tags)
             
             filtered_results['ids'].append(candidates['ids'][i])
             filtered_results['metadatas'].append(meta)
@@ -122,6 +187,12 @@ class VectorStore:
 
         return confidences.tolist()      
 
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]],
+                            batch_size: int = VECTOR_BATCH_SIZE):
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
     def delete_embeddings(self, where: Dict[str, Any]):
         """
         Deletes embeddings based on metadata filter.
@@ -132,8 +203,16 @@ class VectorStore:
     def delete_by_video_id(self, video_id: str):
         self.delete_embeddings({"video_id": video_id})
 
-    def collate(self, raw_results: Dict[str, Any]) -> SearchResults:
-        similarities = self._get_calibrated_confidences(raw_results['distances'][0])
+    def delete_by_video_ids(self, video_ids: List[str]):
+        if not video_ids:
+            return
+        self.delete_embeddings({"video_id": {"$in": list(video_ids)}})
+
+    def collate(self, raw_results: Dict[str, Any], calibrated: bool = True) -> SearchResults:
+        if calibrated:
+            similarities = self._get_calibrated_confidences(raw_results['distances'][0])
+        else:
+            similarities = (1.0 - np.array(raw_results['distances'][0])).tolist()
         return SearchResults(
             ids=raw_results['ids'][0],
             metadatas=raw_results['metadatas'][0],
@@ -151,16 +230,30 @@ class VectorStore:
         Hard reset: Delete and recreate the collection.
         Useful when reset() fails due to internal corruption.
         """
+        name = self.collection.name
         try:
-            name = self.collection.name
             logger.warning(f"Deleting collection {name}...")
             self.client.delete_collection(name)
         except Exception as e:
             logger.warning(f"Could not delete collection (might not exist): {e}")
             
-        logger.info("Recreating collection...")
+        logger.info(f"Recreating collection with {self.hnsw_params}...")
         self.collection = self.client.get_or_create_collection(
             name=name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self.hnsw_params
         )
 
+    @staticmethod
+    def hnsw_metadata() -> Dict[str, Any]:
+        """Collection metadata carrying the HNSW parameters from config."""
+        return {
+            "hnsw:space": HNSW_SPACE,
+            "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": HNSW_SEARCH_EF,
+            "hnsw:M": HNSW_M
+        }
+
+    def index_settings(self) -> Dict[str, Any]:
+        """HNSW parameters the existing collection was actually built with."""
+        return {k: v for k, v in (self.collection.metadata or {}).items() if k.startswith("hnsw:")}
+
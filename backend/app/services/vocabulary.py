@@ -0,0 +1,182 @@
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from app.config import (
+    CALIBRATION_FILE,
+    SIGLIP2_MODEL_ID,
+    STOP_WORDS,
+    VOCABULARY_EMBEDDINGS_FILE,
+    VOCABULARY_MATCH_THRESHOLD,
+    VOCABULARY_MAX_MATCHES,
+    VOCABULARY_MAX_PHRASES,
+    VOCABULARY_PHRASE_CACHE_SIZE,
+    VOCABULARY_BATCH_SIZE
+)
+from .detections import load_class_names
+from .utils import _get_vocabulary_threshold
+
+logger = logging.getLogger(__name__)
+
+MAX_PHRASE_WORDS = 3
+
+
+class ClassVocabulary:
+    """
+    Maps free-text queries onto the detector's class names. The class names are
+    embedded once with the search text encoder and cached on disk; a query is matched
+    by exact word/phrase lookup, then its remaining words and phrases are embedded in
+    one batch (cached across queries) and compared with that matrix in one product,
+    so "a red automobile next to a dog" finds "car" while "cat" no longer matches
+    "category".
+    Embedding a new vocabulary happens off the request path: on a background thread
+    (or inline at warm-up), while the previous vocabulary - or, before the first one
+    is ready, the caller's keyword fallback - keeps serving.
+    """
+    def __init__(self, encode_texts: Callable[[List[str]], np.ndarray]):
+        self.encode_texts = encode_texts
+        # (class names, normalized matrix, lowercase lookup), swapped as one reference
+        self._state: Optional[Tuple[List[str], np.ndarray, Dict[str, str]]] = None
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        self._phrase_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._phrase_lock = threading.Lock()
+        self.threshold = _get_vocabulary_threshold(CALIBRATION_FILE, VOCABULARY_MATCH_THRESHOLD)
+
+    def load(self, wait: bool = False) -> bool:
+        """
+        Whether a vocabulary is ready to match against. A changed saved vocabulary is
+        embedded in the background, or before returning with `wait`.
+        """
+        class_names = load_class_names()
+        state = self._state
+        if class_names and (state is None or class_names is not state[0]):
+            with self._lock:
+                start = class_names is not self._pending
+                if start:
+                    # Set even if the build fails, so a broken encoder isn't retried per request
+                    self._pending = class_names
+            if start and wait:
+                self._build(class_names)
+            elif start:
+                threading.Thread(target=self._build, args=(class_names,),
+                                    name="vocabulary-build", daemon=True).start()
+        return self._state is not None
+
+    def _build(self, class_names: List[str]):
+        try:
+            matrix = self._load_matrix(class_names)
+        except Exception as e:
+            logger.error(f"Failed to embed detector vocabulary: {e}")
+            return
+        self._state = (class_names, matrix, {name.lower(): name for name in class_names})
+        logger.info(f"Detector vocabulary ready ({len(class_names)} classes)")
+
+    def _load_matrix(self, class_names: List[str]) -> np.ndarray:
+        digest = hashlib.sha1("\n".join([SIGLIP2_MODEL_ID] + class_names).encode()).hexdigest()
+        if VOCABULARY_EMBEDDINGS_FILE.exists():
+            with np.load(VOCABULARY_EMBEDDINGS_FILE) as cached:
+                if str(cached["digest"]) == digest:
+                    return cached["matrix"]
+
+        logger.info(f"Embedding detector vocabulary ({len(class_names)} classes)...")
+        matrix = np.concatenate([np.asarray(self.encode_texts(class_names[i:i + VOCABULARY_BATCH_SIZE]),
+                                                dtype=np.float32)
+                                    for i in range(0, len(class_names), VOCABULARY_BATCH_SIZE)])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.savez(VOCABULARY_EMBEDDINGS_FILE, matrix=matrix, digest=np.array(digest))
+        return matrix
+
+    def match(self, query: str, query_vector: Optional[List[float]] = None) -> List[str]:
+        """Canonical class names for a query: exact phrase matches first, then embedding neighbours."""
+        state = self._state
+        if not query or state is None:
+            return []
+
+        class_names, matrix, lookup = state
+        words = re.findall(r"[a-z0-9]+", query.lower())
+        matches, matched_phrases = self._lexical_matches(words, lookup)
+
+        vectors = []
+        phrases = self._candidate_phrases(words, matched_phrases)
+        if phrases:
+            try:
+                vectors.append(self._embed_phrases(phrases))
+            except Exception as e:
+                logger.warning(f"Failed to embed query phrases, matching the whole query only: {e}")
+        if query_vector is not None:
+            vector = np.asarray(query_vector, dtype=np.float32)
+            vectors.append((vector / np.linalg.norm(vector))[None, :])
+        if not vectors:
+            return matches
+
+        # Best score per class over every phrase and the whole query
+        similarities = (np.concatenate(vectors) @ matrix.T).max(axis=0)
+        top = np.argsort(-similarities)[:VOCABULARY_MAX_MATCHES]
+        matches += [class_names[i] for i in top
+                        if similarities[i] >= self.threshold
+                        and class_names[i] not in matches]
+        return matches
+
+    @staticmethod
+    def _phrases(words: List[str]):
+        """(phrase, size) for every run of up to MAX_PHRASE_WORDS words, longest first."""
+        for size in range(MAX_PHRASE_WORDS, 0, -1):
+            for start in range(len(words) - size + 1):
+                yield " ".join(words[start:start + size]), size
+
+    @staticmethod
+    def _is_content(word: str) -> bool:
+        return word not in STOP_WORDS and len(word) > 2
+
+    def _lexical_matches(self, words: List[str], lookup: Dict[str, str]) -> Tuple[List[str], set]:
+        matches, matched_phrases = [], set()
+        for phrase, size in self._phrases(words):
+            if size == 1 and not self._is_content(phrase):
+                continue
+            name = lookup.get(phrase) or (phrase.endswith("s") and lookup.get(phrase[:-1]))
+            if name:
+                matched_phrases.add(phrase)
+                if name not in matches:
+                    matches.append(name)
+        return matches, matched_phrases
+
+    def _candidate_phrases(self, words: List[str], matched_phrases: set) -> List[str]:
+        """
+        Query words and phrases worth embedding: single content words first, then
+        phrases that start and end on one, skipping anything already matched exactly.
+        """
+        phrases = []
+        for phrase, size in sorted(self._phrases(words), key=lambda item: item[1]):
+            edge_words = phrase.split()
+            if (phrase in matched_phrases or phrase in phrases
+                    or not (self._is_content(edge_words[0]) and self._is_content(edge_words[-1]))):
+                continue
+            phrases.append(phrase)
+            if len(phrases) == VOCABULARY_MAX_PHRASES:
+                break
+        return phrases
+
+    def _embed_phrases(self, phrases: List[str]) -> np.ndarray:
+        """Normalized vectors for `phrases`, encoding the ones not cached in one request."""
+        with self._phrase_lock:
+            cached = {p: self._phrase_vectors[p] for p in phrases if p in self._phrase_vectors}
+            for p in cached:
+                self._phrase_vectors.move_to_end(p)
+
+        missing = [p for p in phrases if p not in cached]
+        if missing:
+            encoded = np.asarray(self.encode_texts(missing), dtype=np.float32)
+            encoded /= np.linalg.norm(encoded, axis=1, keepdims=True)
+            with self._phrase_lock:
+                for p, vector in zip(missing, encoded):
+                    cached[p] = vector
+                    self._phrase_vectors[p] = vector
+                while len(self._phrase_vectors) > VOCABULARY_PHRASE_CACHE_SIZE:
+                    self._phrase_vectors.popitem(last=False)
+
+        return np.stack([cached[p] for p in phrases])
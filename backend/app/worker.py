@@ -0,0 +1,141 @@
+import os
+import time
+import socket
+import uuid
+import asyncio
+import logging
+import argparse
+
+from sqlmodel import Session
+
+from app.config import (
+    CHROMA_SERVER_HOST,
+    WORKER_LEASE_SECONDS,
+    WORKER_HEARTBEAT_SECONDS,
+    WORKER_POLL_SECONDS,
+    WORKER_MAX_ATTEMPTS,
+    WORKER_METRICS_PORT
+)
+from app.db.engine import engine, DBClient, create_db_and_tables
+from app.db.models import IndexingJob
+from app.services.resources import apply_indexing_limits, admission_controller
+from app.services.metrics import serve_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IndexingWorker:
+    """
+    Claims queued videos from the database and indexes them. Each job is held under
+    a lease renewed by a heartbeat; if a worker dies the lease expires and another
+    worker picks the job up. Run several with `python -m app.worker`.
+    """
+    def __init__(self, indexing_service, worker_id: str, concurrency: int = 1):
+        self.indexing_service = indexing_service
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+
+    async def run(self):
+        logger.info(f"Indexing worker {self.worker_id} started with {self.concurrency} slot(s)")
+        await asyncio.gather(*(self._slot() for _ in range(self.concurrency)))
+
+    async def _slot(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Failed to claim indexing job: {e}")
+                job = None
+
+            if job is None:
+                await asyncio.sleep(WORKER_POLL_SECONDS)
+                continue
+            await self._process(job)
+
+    def _claim(self):
+        with Session(engine) as session:
+            return DBClient(session).claim_indexing_job(self.worker_id, WORKER_LEASE_SECONDS)
+
+    async def _process(self, job: IndexingJob):
+        if job.attempts > WORKER_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {job.video_id} after {WORKER_MAX_ATTEMPTS} attempts")
+            self.indexing_service._update_metadata(job.video_id, "failed",
+                                                   error=f"Indexing abandoned after {WORKER_MAX_ATTEMPTS} attempts")
+            await asyncio.to_thread(self._complete, job.video_id)
+            return
+
+        logger.info(f"Worker {self.worker_id} claimed {job.video_id} (attempt {job.attempts})")
+        heartbeat = asyncio.create_task(self._heartbeat(job.video_id))
+        try:
+            await self.indexing_service.index_video(job.video_path, job.video_id, job.owner_id)
+        finally:
+            heartbeat.cancel()
+
+        # No-op when the lease was lost or the job dequeued meanwhile
+        await asyncio.to_thread(self._complete, job.video_id)
+
+    async def _heartbeat(self, video_id: str):
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+            try:
+                renewed = await asyncio.to_thread(self._renew, video_id)
+            except Exception as e:
+                # Transient DB errors are tolerated, but the run stops before the lease can
+                # expire: past that point another worker may claim the job and purge its vectors
+                logger.warning(f"Heartbeat failed for {video_id}: {e}")
+                if time.monotonic() - renewed_at + WORKER_HEARTBEAT_SECONDS >= WORKER_LEASE_SECONDS:
+                    self.indexing_service.cancel(video_id, reason="lease_lost")
+                    return
+                continue
+            if renewed:
+                renewed_at = time.monotonic()
+            if not renewed:
+                # A deleted job row means the video was cancelled or deleted; otherwise
+                # another worker re-claimed it and owns the embeddings now
+                reclaimed = await asyncio.to_thread(self._job_exists, video_id)
+                self.indexing_service.cancel(video_id, reason="lease_lost" if reclaimed else "cancelled")
+                return
+
+    def _renew(self, video_id: str) -> bool:
+        with Session(engine) as session:
+            return DBClient(session).renew_indexing_lease(video_id, self.worker_id, WORKER_LEASE_SECONDS)
+
+    def _job_exists(self, video_id: str) -> bool:
+        with Session(engine) as session:
+            return DBClient(session).get_indexing_job(video_id) is not None
+
+    def _complete(self, video_id: str):
+        with Session(engine) as session:
+            DBClient(session).complete_indexing_job(video_id, self.worker_id)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Standalone indexing worker")
+    parser.add_argument("--concurrency", type=int, default=1, help="Videos indexed in parallel")
+    parser.add_argument("--worker-id", type=str, default=None, help="Lease owner id (default host:pid:random)")
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT,
+                        help="Port for this worker's /metrics (0 disables; use distinct ports per host)")
+
+    args = parser.parse_args()
+    if not CHROMA_SERVER_HOST:
+        # An embedded Chroma index is private to its process: the API would never see these writes
+        parser.error("indexing workers need a shared Chroma server; set VANTAGE_CHROMA_HOST")
+    worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    # Thread budgets must be set before the inference libraries load
+    apply_indexing_limits()
+    create_db_and_tables()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    # Searches run in the API processes; back off on the p95 they publish
+    admission_controller.use_shared_latency()
+
+    from app.api import deps
+    worker = IndexingWorker(deps.get_indexing_service(), worker_id, args.concurrency)
+    asyncio.run(worker.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import sys
+import time
+import json
+import argparse
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# Add backend directory to python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.config import INDEXING_STRIDE, PROXY_MAX_SIZE, PROXY_FPS
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Decode strategies for stride-sampled indexing. Each yields (timestamp, frame) for
+# the sampled frames only, so the timestamps can be compared across strategies.
+
+
+def read_every_frame(video_path: str, stride: int):
+    """Baseline: decode and convert every frame, keep every `stride`-th."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    index = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index % stride == 0:
+            yield cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, frame
+        index += 1
+    cap.release()
+
+
+def grab_sampled_frames(video_path: str, stride: int):
+    """grab() demuxes and decodes without the colour conversion and copy; retrieve() only sampled frames."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    index = 0
+    while cap.grab():
+        if index % stride == 0:
+            ok, frame = cap.retrieve()
+            if ok:
+                yield cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, frame
+        index += 1
+    cap.release()
+
+
+def ffmpeg_sampled_frames(video_path: str, fps: float, max_size: int):
+    """ffmpeg drops frames with the fps filter and pipes downscaled raw BGR frames at the target rate."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    width, height = cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    cap.release()
+    scale = min(1.0, max_size / max(width, height))
+    out_w, out_h = int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+
+    command = ["ffmpeg", "-v", "error", "-i", video_path,
+               "-vf", f"fps={fps},scale={out_w}:{out_h}",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+    frame_bytes = out_w * out_h * 3
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    index = 0
+    try:
+        while True:
+            buffer = process.stdout.read(frame_bytes)
+            if len(buffer) < frame_bytes:
+                break
+            yield index / fps, np.frombuffer(buffer, np.uint8).reshape(out_h, out_w, 3)
+            index += 1
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def proxy_frames(video_path: str, fps: float, max_size: int):
+    """What indexing does: transcode the sampling-rate proxy once, then decode all of it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        proxy = str(Path(tmp) / "proxy.mp4")
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", video_path, "-an",
+                        "-vf", (f"fps={fps},scale='min({max_size},iw)':'min({max_size},ih)'"
+                                ":force_original_aspect_ratio=decrease,scale=trunc(iw/2)*2:trunc(ih/2)*2"),
+                        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23", proxy], check=True)
+        yield from read_every_frame(proxy, 1)
+
+
+def bench(name: str, frames) -> dict:
+    start = time.perf_counter()
+    timestamps = [timestamp for timestamp, _ in frames]
+    elapsed = time.perf_counter() - start
+    return {
+        "strategy": name,
+        "seconds": round(elapsed, 3),
+        "sampled_frames": len(timestamps),
+        "ms_per_sampled_frame": round(elapsed * 1000 / max(1, len(timestamps)), 2),
+        "first_timestamps": [round(t, 3) for t in timestamps[:5]]
+    }
+
+
+def run(videos, stride: int, fps: float, max_size: int, strategies):
+    factories = {
+        "full": lambda path: read_every_frame(path, stride),
+        "grab": lambda path: grab_sampled_frames(path, stride),
+        "ffmpeg": lambda path: ffmpeg_sampled_frames(path, fps, max_size),
+        "proxy": lambda path: proxy_frames(path, fps, max_size),
+    }
+    report = []
+    for video in videos:
+        for name in strategies:
+            row = {"video": video, **bench(name, factories[name](video))}
+            report.append(row)
+            print(json.dumps(row))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode time per video for stride-sampled indexing")
+    parser.add_argument("videos", type=str, nargs="+", help="Video files to decode")
+    parser.add_argument("--stride", type=int, default=INDEXING_STRIDE, help="Frame stride for cv2 strategies")
+    parser.add_argument("--fps", type=float, default=PROXY_FPS, help="Sampling rate for ffmpeg strategies")
+    parser.add_argument("--max-size", type=int, default=PROXY_MAX_SIZE, help="Long side for ffmpeg strategies")
+    parser.add_argument("--strategies", type=str, nargs="+", default=["full", "grab", "ffmpeg", "proxy"],
+                        help="Strategies to run")
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON report path")
+
+    args = parser.parse_args()
+    report = run(args.videos, args.stride, args.fps, args.max_size, args.strategies)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
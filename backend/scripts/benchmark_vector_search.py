@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# Add backend directory to python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.vector_store import VectorStore
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 768  # SigLIP2 base
+FRAMES_PER_VIDEO = 200
+HNSW_CONFIGS = {
+    "default": {},
+    "fast": {"hnsw:search_ef": 16, "hnsw:M": 8},
+    "accurate": {"hnsw:construction_ef": 200, "hnsw:search_ef": 128, "hnsw:M": 32},
+}
+
+
+def generate_corpus(n_frames: int, n_owners: int, dim: int, seed: int = 0):
+    """
+    Synthetic frame embeddings: each video is a random direction with per-frame noise,
+    mimicking the temporal coherence of real footage. Rows are L2-normalized.
+    """
+    rng = np.random.default_rng(seed)
+    n_videos = max(1, n_frames // FRAMES_PER_VIDEO)
+
+    centers = rng.standard_normal((n_videos, dim)).astype(np.float32)
+    video_of_frame = rng.integers(0, n_videos, n_frames)
+    embeddings = centers[video_of_frame] + 0.6 * rng.standard_normal((n_frames, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    owner_of_video = rng.integers(1, n_owners + 1, n_videos)
+    ids = [f"frame-{i}" for i in range(n_frames)]
+    metadatas = [{"video_id": f"video-{v}", "owner_id": int(owner_of_video[v]),
+                  "timestamp": float(i % FRAMES_PER_VIDEO)} for i, v in enumerate(video_of_frame)]
+    return ids, embeddings, metadatas
+
+
+def generate_queries(embeddings: np.ndarray, metadatas, n_queries: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(embeddings), n_queries)
+    queries = embeddings[picks] + 0.8 * rng.standard_normal((n_queries, embeddings.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    owners = [metadatas[i]["owner_id"] for i in picks]
+    return queries, owners
+
+
+def exact_neighbours(embeddings: np.ndarray, owner_ids: np.ndarray, queries: np.ndarray,
+                        owners, k: int):
+    """Brute-force cosine ground truth per query, restricted to the query's owner."""
+    truth = []
+    for query, owner in zip(queries, owners):
+        candidates = np.flatnonzero(owner_ids == owner)
+        scores = embeddings[candidates] @ query
+        top = candidates[np.argsort(-scores)[:k]]
+        truth.append(set(top.tolist()))
+    return truth
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def dir_size_mb(path: str) -> float:
+    total = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    return total / 2**20
+
+
+def summarize(latencies, truth, results, k: int) -> dict:
+    recall = np.mean([len(t & r) / max(1, min(k, len(t))) for t, r in zip(truth, results)])
+    return {
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def bench_numpy(embeddings, owner_ids, queries, owners, truth, k: int, filtered: bool) -> dict:
+    latencies, results = [], []
+    for query, owner in zip(queries, owners):
+        start = time.perf_counter()
+        candidates = np.flatnonzero(owner_ids == owner) if filtered else np.arange(len(embeddings))
+        scores = embeddings[candidates] @ query
+        top = candidates[np.argpartition(-scores, min(k, len(scores) - 1))[:k]]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(top.tolist()))
+
+    stats = summarize(latencies, truth, results, k)
+    stats["index_mb"] = round(embeddings.nbytes / 2**20, 1)
+    return stats
+
+
+def bench_chroma(ids, embeddings, metadatas, queries, owners, truth, k: int,
+                    filtered: bool, hnsw_params: dict) -> dict:
+    persist_dir = tempfile.mkdtemp(prefix="vantage-bench-")
+    try:
+        rss_before = rss_mb()
+        store = VectorStore(collection_name="bench", persist_dir=persist_dir, hnsw_params=hnsw_params)
+
+        start = time.perf_counter()
+        store.add_embeddings(ids, embeddings, metadatas)
+        build_s = time.perf_counter() - start
+
+        latencies, results = [], []
+        for query, owner in zip(queries, owners):
+            where = {"owner_id": owner} if filtered else None
+            start = time.perf_counter()
+            found = store.search_embeddings(query.tolist(), n_results=k, where=where)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append({int(i.split("-")[1]) for i in found.ids})
+
+        stats = summarize(latencies, truth, results, k)
+        stats.update({"build_s": round(build_s, 1),
+                      "index_mb": round(dir_size_mb(persist_dir), 1),
+                      "rss_delta_mb": round(rss_mb() - rss_before, 1)})
+        return stats
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def run(scales, n_owners: int, n_queries: int, k: int, dim: int, configs, backends):
+    report = []
+    for n_frames in scales:
+        ids, embeddings, metadatas = generate_corpus(n_frames, n_owners, dim)
+        owner_ids = np.array([m["owner_id"] for m in metadatas])
+        queries, owners = generate_queries(embeddings, metadatas, n_queries)
+
+        for filtered in (False, True):
+            query_owners = owners if filtered else [None] * len(owners)
+            if filtered:
+                truth = exact_neighbours(embeddings, owner_ids, queries, owners, k)
+            else:
+                truth = [set(np.argsort(-(embeddings @ q))[:k].tolist()) for q in queries]
+
+            rows = []
+            if "numpy" in backends:
+                rows.append(("numpy", "exact",
+                             bench_numpy(embeddings, owner_ids, queries, query_owners, truth, k, filtered)))
+            if "chroma" in backends:
+                for name in configs:
+                    rows.append(("chroma", name,
+                                 bench_chroma(ids, embeddings, metadatas, queries, query_owners,
+                                              truth, k, filtered, HNSW_CONFIGS[name])))
+
+            for backend, config, stats in rows:
+                row = {"frames": n_frames, "filtered": filtered, "backend": backend, "config": config, **stats}
+                report.append(row)
+                print(json.dumps(row))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline vector search recall/latency benchmark")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 50_000, 100_000], help="Corpus sizes (frames)")
+    parser.add_argument("--owners", type=int, default=20, help="Number of owners")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per scale")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Embedding dimension")
+    parser.add_argument("--configs", type=str, nargs="+", default=list(HNSW_CONFIGS),
+                        choices=list(HNSW_CONFIGS), help="HNSW configurations to compare")
+    parser.add_argument("--backends", type=str, nargs="+", default=["numpy", "chroma"],
+                        choices=["numpy", "chroma"], help="Backends to benchmark")
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON report path")
+
+    args = parser.parse_args()
+    report = run(args.scales, args.owners, args.queries, args.k, args.dim, args.configs, args.backends)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report saved to {args.output}")
@@ -143,14 +143,72 @@ def calibrate(model_name, device="cpu"):
     }
 
     # 6. Save Results
+    save_results(final_output)
+
+
+def save_results(update: dict):
+    """Merge into the results file, so image and vocabulary calibrations don't overwrite each other."""
+    existing = {}
+    if OUTPUT_FILE.exists():
+        with open(OUTPUT_FILE, 'r') as f:
+            existing = json.load(f)
+    existing.update(update)
     with open(OUTPUT_FILE, 'w') as f:
-        json.dump(final_output, f, indent=4)
+        json.dump(existing, f, indent=4)
     logger.info(f"Results saved to {OUTPUT_FILE}")
 
+
+def calibrate_vocabulary(model_name, device="cpu"):
+    """
+    Text-to-text calibration for mapping query phrases onto detector class names
+    (app/services/vocabulary.py): similarity of synonym vs unrelated phrase/class pairs.
+    """
+    logger.info(f"Starting vocabulary calibration for {model_name} on {device}")
+    embedder = get_embedder(model_name, device)
+    embedder.load_tool({})
+
+    pairs_path = ASSETS_DIR / "vocabulary_pairs.json"
+    with open(pairs_path, 'r') as f:
+        all_pairs = json.load(f)
+
+    stats = {}
+    for cat, pairs in all_pairs.items():
+        scores = []
+        for phrase, class_name in pairs:
+            a, b = np.array(embedder.encode_text(phrase)), np.array(embedder.encode_text(class_name))
+            scores.append(float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))))
+        scores = np.array(scores)
+        stats[cat] = {
+            "mean": float(np.mean(scores)),
+            "std": float(np.std(scores)),
+            "min": float(np.min(scores)),
+            "max": float(np.max(scores)),
+            "count": len(scores)
+        }
+        logger.info(f"{cat:10} | Mean: {stats[cat]['mean']:.4f} | Std: {stats[cat]['std']:.4f} | "
+                    f"Range: [{stats[cat]['min']:.4f}, {stats[cat]['max']:.4f}]")
+
+    # Same heuristic as the image calibration: halfway across the gap, or below every
+    # synonym's mean when the ranges overlap
+    max_unrelated = stats["Unrelated"]["max"]
+    min_synonym = stats["Synonym"]["min"]
+    recommended_threshold = max_unrelated + (min_synonym - max_unrelated) / 2
+    if min_synonym <= max_unrelated:
+        recommended_threshold = (stats["Unrelated"]["max"] + stats["Synonym"]["mean"]) / 2
+
+    logger.info(f"Recommended Vocabulary Match Threshold: {recommended_threshold:.4f}")
+    save_results({"vocabulary": {"model": model_name, "stats": stats,
+                                 "recommended_threshold": recommended_threshold}})
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Calibrate Embedder")
     parser.add_argument("--model", type=str, default="google/siglip2-base-patch16-384", help="Model ID")
     parser.add_argument("--device", type=str, default="cpu", help="Device (cpu/cuda)")
+    parser.add_argument("--vocabulary", action="store_true",
+                        help="Calibrate the query-phrase to class-name match threshold instead")
     
     args = parser.parse_args()
-    calibrate(args.model, args.device)
+    if args.vocabulary:
+        calibrate_vocabulary(args.model, args.device)
+    else:
+        calibrate(args.model, args.device)
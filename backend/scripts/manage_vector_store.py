@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import json
+import argparse
+from datetime import timezone
+import logging
+from pathlib import Path
+import numpy as np
+
+# Add backend directory to python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.vector_store import VectorStore
+from app.services.manifest import save_frames, load_frames, iter_manifests, INFO_FILE
+from app.services.detections import rematerialize
+from app.config import (CHROMA_DB_DIR, CHROMA_SERVER_HOST, CHROMA_SERVER_PORT, SNAPSHOT_DIR,
+                        VECTOR_COLLECTION_NAME, VECTOR_BATCH_SIZE)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def open_store() -> VectorStore:
+    print(f"Opening VectorStore at {CHROMA_SERVER_HOST or CHROMA_DB_DIR}...")
+    return VectorStore(collection_name=VECTOR_COLLECTION_NAME, persist_dir=str(CHROMA_DB_DIR),
+                        host=CHROMA_SERVER_HOST, port=CHROMA_SERVER_PORT)
+
+
+def store_stats(store: VectorStore, sample_size: int = 50, n_results: int = 10) -> dict:
+    """Collection size on disk and query latency, using stored embeddings as queries."""
+    disk_bytes = sum(os.path.getsize(os.path.join(root, f))
+                        for root, _, files in os.walk(CHROMA_DB_DIR) for f in files)
+    stats = {"count": store.count(), "disk_mb": round(disk_bytes / 2**20, 1),
+             "settings": store.index_settings()}
+
+    sample = store.collection.get(include=["embeddings"], limit=sample_size)
+    latencies = []
+    for embedding in sample['embeddings']:
+        start = time.perf_counter()
+        store.search_embeddings(list(embedding), n_results=n_results)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if latencies:
+        stats["p50_ms"] = round(float(np.percentile(latencies, 50)), 2)
+        stats["p95_ms"] = round(float(np.percentile(latencies, 95)), 2)
+    return stats
+
+
+def stored_video_ids(store: VectorStore, batch_size: int = VECTOR_BATCH_SIZE) -> set:
+    video_ids, offset = set(), 0
+    while True:
+        page = store.collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not page['ids']:
+            break
+        video_ids.update(meta.get("video_id") for meta in page['metadatas'])
+        offset += len(page['ids'])
+    return video_ids
+
+
+def confirm_replace(store: VectorStore, kept_video_ids: set, source: str, force: bool) -> bool:
+    """Refuse to clear the collection when videos missing from `source` would be dropped, unless forced."""
+    dropped = sorted(stored_video_ids(store) - kept_video_ids)
+    if not dropped:
+        return True
+    print(f"{len(dropped)} indexed videos are not in {source} and would be dropped:")
+    for video_id in dropped:
+        print(f"  {video_id}")
+    if force:
+        print("Continuing (--force)")
+        return True
+    print("ERROR: Aborting. Re-index those videos first, or re-run with --force to drop them.")
+    return False
+
+
+def compact():
+    """
+    Rebuild the collection in place with the HNSW parameters from config. Drops the
+    tombstones left behind by delete/retry churn. The export is saved as a snapshot
+    before the collection is cleared. Pause indexing while this runs.
+    """
+    store = open_store()
+    before = store_stats(store)
+    print(f"Before: {before}")
+
+    start = time.perf_counter()
+    ids, embeddings, metadatas = store.export_all()
+    backup = f"pre-compact-{int(time.time())}"
+    save_frames(SNAPSHOT_DIR / backup, ids, embeddings, metadatas,
+                    info={"collection": VECTOR_COLLECTION_NAME, "created_at": time.time()})
+    print(f"Saved safety snapshot '{backup}' ({len(ids)} frames)")
+
+    store.clear_collection()
+    try:
+        store.add_embeddings(ids, embeddings, metadatas)
+    except Exception:
+        print(f"ERROR: Reloading failed; recover with `restore {backup} --force`")
+        raise
+    if store.count() != len(ids):
+        print(f"ERROR: Collection holds {store.count()} of {len(ids)} frames; "
+              f"recover with `restore {backup} --force`")
+        return
+    elapsed = time.perf_counter() - start
+
+    after = store_stats(store)
+    print(f"After:  {after}")
+    print(f"Compacted {len(ids)} frames in {elapsed:.1f}s")
+
+
+def rebuild_from_manifests(force: bool = False):
+    """
+    Recreate the collection from per-video frame manifests, without re-running inference.
+    Videos indexed before manifests were written have none; the rebuild refuses to drop
+    them unless forced.
+    """
+    store = open_store()
+    print(f"Current embedding count: {store.count()}")
+    manifest_dirs = list(iter_manifests())
+    if not confirm_replace(store, {d.name for d in manifest_dirs}, "the frame manifests", force):
+        return
+    store.clear_collection()
+
+    start = time.perf_counter()
+    videos, frames = 0, 0
+    for manifest_dir in manifest_dirs:
+        ids, embeddings, metadatas = load_frames(manifest_dir)
+        store.add_embeddings(ids, embeddings, metadatas)
+        videos += 1
+        frames += len(ids)
+
+    elapsed = time.perf_counter() - start
+    print(f"Rebuilt {frames} frames from {videos} manifests in {elapsed:.1f}s "
+          f"(collection count: {store.count()})")
+
+
+def upload_times() -> dict:
+    from sqlmodel import Session, select
+    from app.db.engine import engine
+    from app.db.models import Video
+    with Session(engine) as session:
+        return {video_id: created_at.replace(tzinfo=timezone.utc).timestamp()
+                    for video_id, created_at in session.exec(select(Video.id, Video.created_at))}
+
+
+def backfill(metadata: dict, created_at: dict) -> bool:
+    """Re-derive detection fields and add the filter fields older frames lack."""
+    changed = rematerialize(metadata)
+    if "created_at" not in metadata and metadata.get("video_id") in created_at:
+        metadata["created_at"] = created_at[metadata["video_id"]]
+        changed = True
+    return changed
+
+
+def rematerialize_detections():
+    """
+    Recompute detected_classes/class_confidences and the per-class filter fields from
+    the stored raw detections with the current DETECTION_THRESHOLD and MAX_DETECTIONS,
+    in the collection and in the manifests. Older frames without raw detections get
+    their filter fields from the stored class confidences. No inference is re-run.
+    """
+    start = time.perf_counter()
+    created_at = upload_times()
+    store = open_store()
+    ids, _, metadatas = store.export_all()
+    changed = [(id, meta) for id, meta in zip(ids, metadatas) if backfill(meta, created_at)]
+    store.update_metadatas([id for id, _ in changed], [meta for _, meta in changed])
+    print(f"Updated {len(changed)} of {len(ids)} frames in the collection")
+
+    manifests = 0
+    for manifest_dir in iter_manifests():
+        manifest_ids, embeddings, manifest_metadatas = load_frames(manifest_dir)
+        if any([backfill(meta, created_at) for meta in manifest_metadatas]):
+            save_frames(manifest_dir, manifest_ids, embeddings, manifest_metadatas,
+                            info=json.loads((manifest_dir / INFO_FILE).read_text()))
+            manifests += 1
+    print(f"Rewrote {manifests} manifests in {time.perf_counter() - start:.1f}s")
+
+
+def snapshot(name: str):
+    """Export the whole collection to a snapshot directory. Pause indexing while this runs."""
+    store = open_store()
+    ids, embeddings, metadatas = store.export_all()
+    target = SNAPSHOT_DIR / name
+    save_frames(target, ids, embeddings, metadatas,
+                    info={"collection": VECTOR_COLLECTION_NAME, "created_at": time.time()})
+    print(f"Snapshot '{name}' written to {target} ({len(ids)} frames)")
+
+
+def restore(name: str, force: bool = False):
+    """Replace the collection with the contents of a snapshot (refusing to drop newer videos unless forced)."""
+    source = SNAPSHOT_DIR / name
+    if not source.exists():
+        print(f"ERROR: Snapshot not found at {source}")
+        return
+
+    ids, embeddings, metadatas = load_frames(source)
+    store = open_store()
+    if not confirm_replace(store, {meta.get("video_id") for meta in metadatas}, f"snapshot '{name}'", force):
+        return
+    store.clear_collection()
+    store.add_embeddings(ids, embeddings, metadatas)
+    print(f"Restored {len(ids)} frames from snapshot '{name}' (collection count: {store.count()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector store rebuild and snapshot tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Rebuild the collection from frame manifests")
+    rebuild_parser.add_argument("--force", action="store_true", help="Drop indexed videos that have no manifest")
+    subparsers.add_parser("compact", help="Rebuild the collection in place with the configured HNSW parameters")
+    subparsers.add_parser("stats", help="Report collection size, HNSW settings and query latency")
+    subparsers.add_parser("rematerialize", help="Re-derive detection tags from stored raw detections")
+    snapshot_parser = subparsers.add_parser("snapshot", help="Export the collection to a snapshot")
+    snapshot_parser.add_argument("name", type=str, help="Snapshot name")
+    restore_parser = subparsers.add_parser("restore", help="Replace the collection with a snapshot")
+    restore_parser.add_argument("name", type=str, help="Snapshot name")
+    restore_parser.add_argument("--force", action="store_true", help="Drop indexed videos missing from the snapshot")
+
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        rebuild_from_manifests(args.force)
+    elif args.command == "compact":
+        compact()
+    elif args.command == "rematerialize":
+        rematerialize_detections()
+    elif args.command == "stats":
+        print(store_stats(open_store()))
+    elif args.command == "snapshot":
+        snapshot(args.name)
+    elif args.command == "restore":
+        restore(args.name, args.force)